@@ -0,0 +1,614 @@
+# loadtest.py
+"""
+无头压测：用桩模块代替 AstrBot，在一个事件循环里驱动大量模拟会话，
+调用 MinesweeperPlugin 的真实指令处理函数，输出吞吐、事件循环延迟、
+各指令延迟分位数、内存增长与启动耗时。
+
+用法（在插件目录下）：
+    python bench/loadtest.py --sessions 2000 --concurrency 500 --moves 30
+    python bench/loadtest.py --mix open=6,mark=2,range=1,show=1 --solver 0.5
+    python bench/loadtest.py --set shard_workers=2 --set coop_mode=true
+"""
+
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from collections import Counter, defaultdict
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PACKAGE = "minesweeper_plugin"
+
+# ========= AstrBot 桩模块 =========
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    mod = sys.modules.get(name)
+    if mod is None:
+        mod = types.ModuleType(name)
+        mod.__path__ = []
+        sys.modules[name] = mod
+    mod.__dict__.update(attrs)
+    return mod
+
+
+class _Filter:
+    """装饰器原样返回处理函数"""
+
+    def __getattr__(self, _name):
+        return lambda *args, **kwargs: (lambda f: f)
+
+
+class _AstrMessageEvent:
+    pass
+
+
+class _AiocqhttpMessageEvent(_AstrMessageEvent):
+    pass
+
+
+class _MessageChain:
+    def __init__(self):
+        self.chain = []
+
+    def message(self, text: str):
+        self.chain.append(text)
+        return self
+
+
+class _Plain:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Image:
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def fromBytes(cls, data: bytes):
+        return cls(data)
+
+    @classmethod
+    def fromFileSystem(cls, path: str):
+        return cls(path)
+
+
+class _Star:
+    def __init__(self, context):
+        self.context = context
+
+
+class _StarTools:
+    data_dir: Path | None = None
+
+    @classmethod
+    def get_data_dir(cls) -> Path:
+        if cls.data_dir is None:
+            cls.data_dir = Path(tempfile.mkdtemp(prefix="minesweeper-load-"))
+        return cls.data_dir
+
+
+def install_stubs():
+    """注册最小可用的 astrbot 桩模块，并把插件目录挂成包"""
+    logger = logging.getLogger("loadtest.astrbot")
+    _module("astrbot")
+    _module("astrbot.api", logger=logger)
+    _module(
+        "astrbot.api.event",
+        filter=_Filter(),
+        AstrMessageEvent=_AstrMessageEvent,
+        MessageChain=_MessageChain,
+    )
+    _module("astrbot.api.star", Context=object, Star=_Star)
+    _module("astrbot.core", AstrBotConfig=dict)
+    _module("astrbot.core.config")
+    _module("astrbot.core.config.astrbot_config", AstrBotConfig=dict)
+    _module("astrbot.core.message")
+    _module("astrbot.core.message.components", Plain=_Plain, Image=_Image)
+    _module("astrbot.core.platform", AstrMessageEvent=_AstrMessageEvent)
+    _module("astrbot.core.platform.sources")
+    _module("astrbot.core.platform.sources.aiocqhttp")
+    _module(
+        "astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event",
+        AiocqhttpMessageEvent=_AiocqhttpMessageEvent,
+    )
+    _module("astrbot.core.star")
+    _module("astrbot.core.star.star_tools", StarTools=_StarTools)
+
+    # 插件使用相对导入，需要作为包加载
+    pkg = _module(PACKAGE)
+    pkg.__path__ = [str(PLUGIN_DIR)]
+
+
+# spawn 出的分片进程会重新导入本模块，桩必须在模块级安装
+install_stubs()
+_parser = importlib.import_module(f"{PACKAGE}.core.parser")
+
+
+# ========= 假配置 / 事件 / 发送端 =========
+
+
+def load_config(overrides: list[str]) -> dict:
+    """以 _conf_schema.json 的默认值为基础，叠加 --set key=value"""
+    schema = json.loads((PLUGIN_DIR / "_conf_schema.json").read_text("utf-8"))
+    config = {key: item.get("default") for key, item in schema.items()}
+    config.update(use_gui=False, ban_time=0)
+
+    for item in overrides:
+        key, _, raw = item.partition("=")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        config[key.strip()] = value
+    return config
+
+
+class FakeEvent(_AiocqhttpMessageEvent):
+    def __init__(self, session_id: str, user_id: str, message: str):
+        self.session_id = session_id
+        self.unified_msg_origin = f"aiocqhttp:GroupMessage:{session_id}"
+        self.message_str = message
+        self.user_id = user_id
+        self.bot = None
+
+    def get_sender_id(self) -> str:
+        return self.user_id
+
+    def get_sender_name(self) -> str:
+        return f"玩家{self.user_id}"
+
+    def get_self_id(self) -> str:
+        return "bench"
+
+    def get_group_id(self) -> str:
+        return self.session_id
+
+    def is_private_chat(self) -> bool:
+        return False
+
+    def plain_result(self, text: str):
+        return ("plain", text)
+
+    def chain_result(self, chain: list):
+        return ("chain", chain)
+
+    async def send(self, result):
+        pass
+
+
+class FakeContext:
+    async def send_message(self, origin, chain):
+        pass
+
+
+def make_sink_sender(base: type, latency: float):
+    """
+    真实 MessageSender 的子类，只替换协议端调用：
+    发送排队、覆盖与撤回逻辑照常执行，图片字节计入统计后丢弃
+    """
+
+    class SinkSender(base):
+        sent = 0
+        recalled = 0
+        sent_bytes = 0
+        _ids = iter(range(1, 1 << 62))
+
+        @staticmethod
+        async def _send_msg(event, payloads: dict) -> int | None:
+            if latency:
+                await asyncio.sleep(latency)
+            SinkSender.sent += 1
+            data = payloads["message"][0]["data"]
+            SinkSender.sent_bytes += len(data.get("file") or data.get("text"))
+            return next(SinkSender._ids)
+
+        @staticmethod
+        async def _recall_message(event, message_id: int):
+            if latency:
+                await asyncio.sleep(latency)
+            SinkSender.recalled += 1
+
+    return SinkSender
+
+
+# ========= 统计 =========
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def rss_mb() -> float:
+    """当前常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class Stats:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.replies: Counter[str] = Counter()
+        self.games_started = 0
+        self.games_over = 0
+
+    def record(self, handler: str, seconds: float, results: list):
+        self.latency[handler].append(seconds)
+        for kind, payload in results:
+            if kind == "plain":
+                for line in payload.split("\n"):
+                    self.replies[line.split("，")[0][:16]] += 1
+
+
+class LoopLagMonitor:
+    """定时 sleep，记录实际唤醒比预期晚了多少"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+# ========= 玩家 =========
+
+
+def cell(row: int, col: int) -> str:
+    return _parser.cell_label(row, col)
+
+
+def solver_moves(game) -> tuple[list[str], list[str]]:
+    """
+    只看玩家可见信息的单格推理：
+    数字 == 周围旗子数 -> 其余未开格安全；数字 == 旗子 + 未开格 -> 未开格全是雷
+    """
+    rows, cols = game.spec.rows, game.spec.cols
+    tiles = game.tiles
+    safe, mines = set(), set()
+    for i in range(rows):
+        for j in range(cols):
+            t = tiles[i][j]
+            if not t.is_open or t.is_mine or t.count == 0:
+                continue
+            hidden, flagged = [], 0
+            for x in range(max(i - 1, 0), min(i + 2, rows)):
+                for y in range(max(j - 1, 0), min(j + 2, cols)):
+                    n = tiles[x][y]
+                    if n.is_open:
+                        continue
+                    if n.marked:
+                        flagged += 1
+                    else:
+                        hidden.append((x, y))
+            if not hidden:
+                continue
+            if t.count == flagged:
+                safe.update(hidden)
+            elif t.count == flagged + len(hidden):
+                mines.update(hidden)
+    return [cell(*p) for p in safe], [cell(*p) for p in mines]
+
+
+class Player:
+    def __init__(self, plugin, stats: Stats, args, index: int, rng: random.Random):
+        self.plugin = plugin
+        self.stats = stats
+        self.args = args
+        self.rng = rng
+        self.session_id = f"group{index}"
+        self.user_id = str(10000 + index)
+        self.solver = rng.random() < args.solver
+        ops, weights = zip(*args.mix.items())
+        self.ops = ops
+        self.weights = weights
+
+    def event(self, message: str) -> FakeEvent:
+        return FakeEvent(self.session_id, self.user_id, message)
+
+    async def call(self, name: str, message: str, *handler_args) -> list:
+        handler = getattr(self.plugin, name)
+        start = time.perf_counter()
+        results = [r async for r in handler(self.event(message), *handler_args)]
+        self.stats.record(name, time.perf_counter() - start, results)
+        return results
+
+    def _random_cells(self, game, count: int) -> list[str]:
+        rows, cols = game.spec.rows, game.spec.cols
+        return [
+            cell(self.rng.randrange(rows), self.rng.randrange(cols))
+            for _ in range(count)
+        ]
+
+    def next_message(self, game) -> tuple[str, str]:
+        op = self.rng.choices(self.ops, self.weights)[0]
+        if op == "show":
+            return "show_minesweeper", "雷盘"
+
+        if self.solver and hasattr(game, "tiles"):
+            safe, mines = solver_moves(game)
+            if op == "mark" and mines:
+                return "mark_minesweeper", "标雷 " + " ".join(mines[:8])
+            if safe:
+                return "open_minesweeper", " ".join(safe[: self.args.batch])
+
+        if op == "range":
+            rows, cols = game.spec.rows, game.spec.cols
+            r, c = self.rng.randrange(rows), self.rng.randrange(cols)
+            end = cell(min(r + 2, rows - 1), min(c + 2, cols - 1))
+            return "open_minesweeper", f"{cell(r, c)}-{end}"
+        cells = " ".join(self._random_cells(game, self.rng.randint(1, self.args.batch)))
+        if op == "mark":
+            return "mark_minesweeper", f"标雷 {cells}"
+        return "open_minesweeper", cells
+
+    async def play(self):
+        budget = self.args.moves
+        while budget > 0:
+            await self.call("start_minesweeper", "扫雷", self.args.level)
+            self.stats.games_started += 1
+            while budget > 0:
+                game = self.plugin.game_mgr.get(self.session_id)
+                if game is None:
+                    self.stats.games_over += 1
+                    break
+                name, message = self.next_message(game)
+                await self.call(name, message)
+                budget -= 1
+                if self.args.think:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.args.think))
+        self.plugin.game_mgr.stop(self.session_id)
+
+
+# ========= 主流程 =========
+
+
+async def measure_game_memory(plugin, args, count: int = 20) -> float:
+    """
+    开 count 局并各挖一格，用 tracemalloc 快照差统计每局常驻的 Python 内存（字节）：
+    游戏对象、布局、渲染器、执行器与监听都计入，首局已加载的共享皮肤不计，
+    Pillow / FreeType 在 C 层的分配也不在其中
+    """
+    players = [
+        Player(plugin, Stats(), args, -2 - i, random.Random(i)) for i in range(count)
+    ]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for player in players:
+        await player.call("start_minesweeper", "扫雷", args.level)
+        await player.call("open_minesweeper", "a1")
+    await plugin.sender.close()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    for player in players:
+        plugin.game_mgr.stop(player.session_id)
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return retained / count
+
+
+async def run(args) -> dict:
+    stats = Stats()
+    report: dict = {}
+
+    rss_start = rss_mb()
+    t0 = time.perf_counter()
+    main = importlib.import_module(f"{PACKAGE}.main")
+    sender_mod = importlib.import_module(f"{PACKAGE}.sender")
+    report["import_ms"] = (time.perf_counter() - t0) * 1000
+
+    config = load_config(args.set)
+    t1 = time.perf_counter()
+    plugin = main.MinesweeperPlugin(FakeContext(), config)
+    Sink = make_sink_sender(sender_mod.MessageSender, args.send_latency / 1000)
+    plugin.sender = Sink(config, plugin.cache_dir, id_ttl=plugin.idle_ttl)
+    await plugin.initialize()
+    report["init_ms"] = (time.perf_counter() - t1) * 1000
+
+    # 首局包含渲染模块导入与皮肤预热
+    t2 = time.perf_counter()
+    warm = Player(plugin, Stats(), args, -1, random.Random(0))
+    await warm.call("start_minesweeper", "扫雷", args.level)
+    plugin.game_mgr.stop(warm.session_id)
+    report["first_game_ms"] = (time.perf_counter() - t2) * 1000
+    per_game = await measure_game_memory(plugin, args)
+
+    gc.collect()
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = rss_mb()
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    rng = random.Random(args.seed)
+    players = [
+        Player(plugin, stats, args, i, random.Random(rng.getrandbits(64)))
+        for i in range(args.sessions)
+    ]
+    gate = asyncio.Semaphore(args.concurrency)
+    peak = {"rss": rss_before, "games": 0}
+
+    async def guarded(player: Player):
+        async with gate:
+            await player.play()
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(0.5)
+            peak["rss"] = max(peak["rss"], rss_mb())
+            peak["games"] = max(peak["games"], len(plugin.game_mgr.games))
+
+    sampler = asyncio.create_task(sample_memory())
+    start = time.perf_counter()
+    await asyncio.gather(*(guarded(p) for p in players))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    await monitor.stop()
+
+    await plugin.sender.close()
+    rss_after = rss_mb()
+    if args.tracemalloc:
+        current, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["traced_mb"] = {"current": current / 2**20, "peak": traced_peak / 2**20}
+
+    calls = sum(len(v) for v in stats.latency.values())
+    report.update(
+        sessions=args.sessions,
+        concurrency=args.concurrency,
+        elapsed_s=elapsed,
+        handler_calls=calls,
+        calls_per_s=calls / elapsed if elapsed else 0.0,
+        games_started=stats.games_started,
+        games_finished=stats.games_over,
+        images_sent=Sink.sent,
+        images_recalled=Sink.recalled,
+        sent_mb=Sink.sent_bytes / 2**20,
+        outbound=plugin.sender.budget_stats(),
+        loop_lag_ms={
+            q: percentile(sorted(monitor.samples), p) * 1000
+            for q, p in (("p50", 0.5), ("p99", 0.99), ("max", 1.0))
+        },
+        latency_ms={
+            name: {
+                "n": len(values),
+                **{
+                    q: percentile(sorted(values), p) * 1000
+                    for q, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+                },
+            }
+            for name, values in sorted(stats.latency.items())
+        },
+        memory_mb={
+            "rss_start": rss_start,
+            "rss_before": rss_before,
+            "rss_peak": peak["rss"],
+            "rss_after": rss_after,
+            "growth": rss_after - rss_before,
+            "peak_games": peak["games"],
+            "per_game_kb": per_game / 1024,
+            "peak_game_state": per_game * peak["games"] / 2**20,
+        },
+        replies=dict(stats.replies.most_common(8)),
+    )
+
+    await plugin.terminate()
+    return report
+
+
+def print_report(report: dict):
+    print(f"启动：导入 {report['import_ms']:.0f} ms，初始化 {report['init_ms']:.0f} ms，"
+          f"首局 {report['first_game_ms']:.0f} ms")
+    print(f"会话 {report['sessions']}（并发 {report['concurrency']}），"
+          f"耗时 {report['elapsed_s']:.2f} s，"
+          f"指令 {report['handler_calls']} 次，{report['calls_per_s']:.0f} 次/秒")
+    print(f"对局：开始 {report['games_started']}，结束 {report['games_finished']}；"
+          f"发图 {report['images_sent']}（{report['sent_mb']:.1f} MB），"
+          f"撤回 {report['images_recalled']}")
+    for name, counters in report["outbound"].items():
+        print(f"{name}：" + "，".join(f"{k} {v}" for k, v in counters.items()
+                                      if k != "tokens"))
+    lag = report["loop_lag_ms"]
+    print(f"事件循环延迟：p50 {lag['p50']:.1f} ms，p99 {lag['p99']:.1f} ms，"
+          f"max {lag['max']:.1f} ms")
+    print(f"{'指令':<20}{'次数':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, lat in report["latency_ms"].items():
+        print(f"{name:<20}{lat['n']:>8}{lat['p50']:>10.1f}{lat['p90']:>10.1f}"
+              f"{lat['p99']:>10.1f}{lat['max']:>10.1f}")
+    mem = report["memory_mb"]
+    print(f"内存：RSS {mem['rss_before']:.0f} -> 峰值 {mem['rss_peak']:.0f} -> "
+          f"{mem['rss_after']:.0f} MB（增长 {mem['growth']:+.1f} MB），"
+          f"峰值 {mem['peak_games']} 局 × 单局常驻 {mem['per_game_kb']:.0f} KB"
+          f"（tracemalloc 实测）≈ {mem['peak_game_state']:.1f} MB")
+    if "traced_mb" in report:
+        traced = report["traced_mb"]
+        print(f"tracemalloc：当前 {traced['current']:.1f} MB，峰值 {traced['peak']:.1f} MB")
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        op, _, weight = item.partition("=")
+        if op not in ("open", "mark", "range", "show"):
+            raise argparse.ArgumentTypeError(f"未知操作 {op}")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫雷插件无头压测")
+    parser.add_argument("--sessions", type=int, default=1000, help="模拟会话数")
+    parser.add_argument("--concurrency", type=int, default=200, help="同时活跃的会话数")
+    parser.add_argument("--moves", type=int, default=20, help="每个会话发送的指令数")
+    parser.add_argument("--batch", type=int, default=3, help="单条指令最多几个坐标")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("open=6,mark=2,range=1,show=1"),
+        help="操作权重，如 open=6,mark=2,range=1,show=1",
+    )
+    parser.add_argument("--solver", type=float, default=0.0, help="推理玩家占比 0~1")
+    parser.add_argument("--level", default="", help="难度名，默认第一个难度")
+    parser.add_argument("--think", type=float, default=0.0, help="平均思考时间（秒）")
+    parser.add_argument(
+        "--send-latency", type=float, default=0.0, help="模拟协议端往返（毫秒）"
+    )
+    parser.add_argument(
+        "--set", action="append", default=[], help="覆盖配置，如 shard_workers=2"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="统计 Python 分配")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if _StarTools.data_dir:
+            shutil.rmtree(_StarTools.data_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
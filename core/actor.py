@@ -0,0 +1,61 @@
+# actor.py
+import asyncio
+import inspect
+from collections.abc import Callable
+from typing import Any
+
+
+class SessionActor:
+    """
+    单个会话的串行执行器：
+    - 有界收件箱，任务严格按提交顺序执行
+    - 收件箱满时 submit 抛出 asyncio.QueueFull，由调用方决定如何提示
+    - 每个任务执行完都让出事件循环，多个会话之间轮流推进
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self._inbox: asyncio.Queue[tuple[Callable[[], Any], asyncio.Future]] = (
+            asyncio.Queue(maxsize)
+        )
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return self._inbox.qsize()
+
+    @property
+    def idle(self) -> bool:
+        """没有排队或执行中的任务"""
+        return self._worker is None or self._worker.done()
+
+    def submit(self, job: Callable[[], Any]) -> asyncio.Future:
+        """
+        提交任务，job 可返回普通值或可等待对象
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inbox.put_nowait((job, future))
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while not self._inbox.empty():
+            job, future = self._inbox.get_nowait()
+            if future.cancelled():
+                continue
+
+            try:
+                result = job()
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+            # 让出事件循环，避免单个会话连续占用
+            await asyncio.sleep(0)
@@ -0,0 +1,274 @@
+# admission.py
+"""
+开局准入控制：按 GameSpec 估算每局的内存与单帧渲染耗时，
+限制全局 / 单群同时进行的游戏数、估算内存总量与开局渲染速率，
+超出时排队等待，等待超时或队列已满则拒绝。
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from .model import GameSpec
+from .parser import MAX_ROWS
+
+# 与 SkinManager._build_background 的拼接尺寸、渲染器默认放大倍数一致
+TILE_SIZE = 16
+FRAME_W = 24
+FRAME_H = 66
+RENDER_SCALE = 4
+
+# 单个输出像素的渲染 + PNG 编码耗时（毫秒），未校准时的默认值
+MS_PER_PIXEL = 1e-4
+# 单个坐标文字的绘制耗时（毫秒），未校准时的默认值
+MS_PER_LABEL = 0.02
+# 每局固定开销：对象、渲染器与字体句柄（每个渲染器各载入一份 FreeType 字体，
+# 实测连同游戏对象约 30KB）
+BASE_BYTES = 32 * 1024
+
+
+class AdmissionRejected(Exception):
+    """开局请求被拒绝，消息可直接展示给用户"""
+
+
+@dataclass(frozen=True, slots=True)
+class GameCost:
+    # 常驻内存（字节）
+    memory: int
+    # 单帧渲染时的临时图像内存（字节）
+    frame_bytes: int
+    # 单帧渲染估算耗时（毫秒）
+    render_ms: float
+
+
+@dataclass(frozen=True, slots=True)
+class RenderProfile:
+    """
+    渲染开销参数：皮肤贴图边长、渲染放大倍数，
+    以及实测耗时与默认常量估算之比（未校准时为 1）
+    """
+
+    tile_size: int = TILE_SIZE
+    scale: int = RENDER_SCALE
+    factor: float = 1.0
+
+    @classmethod
+    def calibrate(
+        cls, spec: GameSpec, tile_size: int, scale: int, measured_ms: float
+    ) -> "RenderProfile":
+        """由一帧 spec 棋盘的实测渲染耗时得出校准系数"""
+        estimated = estimate_cost(spec, cls(tile_size, scale)).render_ms
+        return cls(tile_size, scale, measured_ms / estimated)
+
+
+DEFAULT_PROFILE = RenderProfile()
+
+
+def estimate_cost(spec: GameSpec, profile: RenderProfile = DEFAULT_PROFILE) -> GameCost:
+    """
+    由棋盘规格估算单局开销
+    """
+    tile_size, scale = profile.tile_size, profile.scale
+    cells = spec.rows * spec.cols
+    native = (spec.cols * tile_size + FRAME_W) * (spec.rows * tile_size + FRAME_H)
+    pixels = native * scale * scale
+    return GameCost(
+        # 两个位集 + 布局（雷位集与每格雷数）+ 背景图（RGBA）
+        memory=BASE_BYTES + cells // 4 + cells + native * 4,
+        frame_bytes=pixels * 4,
+        render_ms=(pixels * MS_PER_PIXEL + cells * MS_PER_LABEL) * profile.factor,
+    )
+
+
+def validate_spec(
+    spec: GameSpec, max_render_ms: float = 0, profile: RenderProfile = DEFAULT_PROFILE
+) -> str | None:
+    """
+    校验难度预设，合法时返回 None，否则返回原因
+    """
+    cells = spec.rows * spec.cols
+    if spec.rows < 1 or spec.cols < 1:
+        return "行列数必须大于 0"
+    if spec.rows > MAX_ROWS:
+        return f"行数最多 {MAX_ROWS}（行号最多两个字母）"
+    if not 1 <= spec.mines < cells:
+        return f"雷数应在 1 ~ {cells - 1} 之间"
+
+    cost = estimate_cost(spec, profile)
+    if max_render_ms and cost.render_ms > max_render_ms:
+        return f"单帧渲染估算 {cost.render_ms:.0f}ms，超过上限 {max_render_ms:.0f}ms"
+    return None
+
+
+@dataclass(slots=True)
+class _Ticket:
+    group: str
+    cost: GameCost
+
+
+class AdmissionController:
+    """
+    全局准入：
+    - 同时进行的游戏数（全局 / 单群）与估算常驻内存总量，超出时等待有游戏结束
+    - 开局首帧渲染按令牌桶限速，每秒补充 render_budget 毫秒
+    - 单群超限直接拒绝；全局超限排队，最多等待 wait 秒、排队 queue_size 个
+    所有上限为 0 表示不限制
+    """
+
+    def __init__(
+        self,
+        max_games: int = 0,
+        max_games_per_group: int = 0,
+        max_memory_mb: float = 0,
+        render_budget: float = 0,
+        wait: float = 10,
+        queue_size: int = 64,
+    ):
+        self.max_games = max_games
+        self.max_games_per_group = max_games_per_group
+        self.max_memory = int(max_memory_mb * 2**20)
+        self.render_budget = render_budget
+        self.wait = wait
+        self.queue_size = queue_size
+
+        self._tickets: dict[str, _Ticket] = {}
+        self._groups: dict[str, int] = {}
+        self._memory = 0
+        # 排队中的 key，按到达顺序
+        self._queue: deque[str] = deque()
+        self._changed = asyncio.Condition()
+
+        # 令牌桶：容量为一秒的预算
+        self._tokens = render_budget
+        self._refilled = time.monotonic()
+
+    # ========= 状态 =========
+
+    @property
+    def games(self) -> int:
+        return len(self._tickets)
+
+    @property
+    def memory(self) -> int:
+        return self._memory
+
+    # ========= 申请 / 释放 =========
+
+    def try_admit(self, key: str, group: str, cost: GameCost) -> bool:
+        """
+        立即申请开局名额，需要排队时返回 False；单群超限抛出 AdmissionRejected
+        """
+        if key in self._tickets:
+            return True
+        self._check_group(group)
+        # 已有人排队时不插队
+        return not self._queue and self._try_take(key, group, cost)
+
+    async def admit(self, key: str, group: str, cost: GameCost):
+        """
+        排队等待开局名额，超时或队列已满时抛出 AdmissionRejected
+        """
+        if len(self._queue) >= self.queue_size:
+            raise AdmissionRejected(self._busy_message())
+
+        deadline = time.monotonic() + self.wait
+        self._queue.append(key)
+        try:
+            async with self._changed:
+                # 先到先得：只有队首可以占用名额
+                while not (self._queue[0] == key and self._try_take(key, group, cost)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionRejected(self._busy_message())
+                    # 名额由 release 唤醒，令牌按补充速率估算等待时间
+                    try:
+                        await asyncio.wait_for(
+                            self._changed.wait(),
+                            min(remaining, self._token_wait(cost)),
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._queue.remove(key)
+            asyncio.ensure_future(self._notify())
+
+    def register(self, key: str, group: str, cost: GameCost):
+        """
+        登记已存在的游戏（重载后从快照恢复），不受上限约束，只用于计数
+        """
+        if key not in self._tickets:
+            self._take(key, group, cost)
+
+    def release(self, key: str):
+        """游戏结束，归还名额"""
+        ticket = self._tickets.pop(key, None)
+        if ticket is None:
+            return
+        self._memory -= ticket.cost.memory
+        left = self._groups.get(ticket.group, 0) - 1
+        if left > 0:
+            self._groups[ticket.group] = left
+        else:
+            self._groups.pop(ticket.group, None)
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    # ========= 内部实现 =========
+
+    def _check_group(self, group: str):
+        """单群超限直接拒绝"""
+        if (
+            self.max_games_per_group
+            and self._groups.get(group, 0) >= self.max_games_per_group
+        ):
+            raise AdmissionRejected(
+                f"本群同时进行的扫雷游戏已达上限（{self.max_games_per_group} 局）"
+            )
+
+    def _try_take(self, key: str, group: str, cost: GameCost) -> bool:
+        """
+        每次尝试都重新检查单群上限：同群的多个排队请求可能先后拿到名额
+        """
+        self._check_group(group)
+        if self.max_games and len(self._tickets) >= self.max_games:
+            return False
+        if self.max_memory and self._memory + cost.memory > self.max_memory:
+            return False
+        if self.render_budget:
+            self._refill()
+            # 单帧超出整桶时只要桶满即可放行，避免永远等不到
+            need = min(cost.render_ms, self.render_budget)
+            if self._tokens < need:
+                return False
+            self._tokens -= cost.render_ms
+
+        self._take(key, group, cost)
+        return True
+
+    def _take(self, key: str, group: str, cost: GameCost):
+        self._tickets[key] = _Ticket(group, cost)
+        self._groups[group] = self._groups.get(group, 0) + 1
+        self._memory += cost.memory
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.render_budget,
+            self._tokens + (now - self._refilled) * self.render_budget,
+        )
+        self._refilled = now
+
+    def _token_wait(self, cost: GameCost) -> float:
+        if not self.render_budget:
+            return self.wait
+        deficit = min(cost.render_ms, self.render_budget) - self._tokens
+        return max(deficit / self.render_budget, 0.01)
+
+    def _busy_message(self) -> str:
+        if self.max_games and len(self._tickets) >= self.max_games:
+            return f"当前进行中的扫雷游戏过多（{self.max_games} 局），请稍后再试"
+        return "当前开局人数较多，请稍后再试"
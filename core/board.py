@@ -0,0 +1,157 @@
+# board.py
+"""
+棋盘布局与位集：格子按行展开为下标 i = row * cols + col，
+雷、已挖开、已标记等格子集合统一用 Python int 位集表示。
+布局（雷的位置与周围雷数）一经生成只读，可被多局游戏共享。
+难度指标（3BV 等）在生成布局时用位集整体运算一次算出。
+"""
+
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .model import GameSpec
+
+
+def bits(mask: int, n: int) -> str:
+    """
+    位集转为按格子下标排列的 "0"/"1" 字符串
+    """
+    return format(mask, f"0{n}b")[::-1] if n else ""
+
+
+@lru_cache(maxsize=64)
+def neighbor_table(spec: GameSpec) -> tuple[tuple[int, ...], ...]:
+    """
+    每格的相邻格下标（同一规格的所有棋盘共用）
+    """
+    rows, cols = spec.rows, spec.cols
+    table = []
+    for x in range(rows):
+        for y in range(cols):
+            table.append(
+                tuple(
+                    nx * cols + ny
+                    for nx in range(max(x - 1, 0), min(x + 2, rows))
+                    for ny in range(max(y - 1, 0), min(y + 2, cols))
+                    if (nx, ny) != (x, y)
+                )
+            )
+    return tuple(table)
+
+
+@lru_cache(maxsize=64)
+def _edge_masks(spec: GameSpec) -> tuple[int, int, int]:
+    """
+    (全盘, 去掉首列, 去掉末列) 位集，用于整体平移时屏蔽跨行的进位
+    """
+    rows, cols = spec.rows, spec.cols
+    full = (1 << rows * cols) - 1
+    first = sum(1 << x * cols for x in range(rows))
+    last = first << cols - 1
+    return full, full & ~first, full & ~last
+
+
+def dilate(spec: GameSpec, mask: int) -> int:
+    """
+    位集向八个方向各扩张一格（含自身）
+    """
+    full, no_first, no_last = _edge_masks(spec)
+    row = mask | (mask << 1) & no_first | (mask >> 1) & no_last
+    return (row | row << spec.cols | row >> spec.cols) & full
+
+
+@dataclass(frozen=True, slots=True)
+class BoardMetrics:
+    # 3BV：不借助标记通关所需的最少点击数
+    bbbv: int
+    # 空白连通区（点一下即展开一片）的个数
+    openings: int
+    # 不与任何空白区相邻、必须单独点开的数字格个数
+    isolated: int
+
+    @classmethod
+    def measure(cls, spec: GameSpec, mines: int) -> "BoardMetrics":
+        """
+        一次标记空白格的连通区：
+        空白格 = 周围九格都没有雷，连通区逐圈扩张直到不再变化
+        """
+        full = _edge_masks(spec)[0]
+        safe = full & ~mines
+        zero = full & ~dilate(spec, mines)
+
+        openings = 0
+        rest = zero
+        while rest:
+            region = rest & -rest
+            while True:
+                grown = dilate(spec, region) & zero
+                if grown == region:
+                    break
+                region = grown
+            rest &= ~region
+            openings += 1
+
+        # 空白区及其边缘数字格都会随空白区一起展开
+        isolated = (safe & ~dilate(spec, zero)).bit_count()
+        return cls(openings + isolated, openings, isolated)
+
+
+@dataclass(frozen=True, slots=True)
+class BoardLayout:
+    spec: GameSpec
+    # 雷位集
+    mines: int
+    # 每格周围雷数
+    counts: bytes
+    metrics: BoardMetrics
+
+    @classmethod
+    def from_mines(cls, spec: GameSpec, mines: int) -> "BoardLayout":
+        counts = bytes(
+            sum(mines >> n & 1 for n in around)
+            for around in neighbor_table(spec)
+        )
+        return cls(spec, mines, counts, BoardMetrics.measure(spec, mines))
+
+    @classmethod
+    def generate(
+        cls, spec: GameSpec, seed: int, exclude: int | None = None
+    ) -> "BoardLayout":
+        """
+        按种子布雷，exclude 格保证不是雷
+        """
+        rng = random.Random(seed)
+        mines = 0
+        count = 0
+        while count < spec.mines:
+            i = rng.randrange(spec.rows) * spec.cols + rng.randrange(spec.cols)
+            if i == exclude or mines >> i & 1:
+                continue
+            mines |= 1 << i
+            count += 1
+        return cls.from_mines(spec, mines)
+
+    def is_mine(self, i: int) -> bool:
+        return bool(self.mines >> i & 1)
+
+    def flood(self, start: int, opened: int) -> int:
+        """
+        从空白格 start 向外展开，返回新挖开的格子位集（不含 start）
+        """
+        table = neighbor_table(self.spec)
+        counts = self.counts
+        mines = self.mines
+        blocked = opened | mines | 1 << start
+        revealed = 0
+        stack = [start]
+        while stack:
+            for n in table[stack.pop()]:
+                bit = 1 << n
+                if blocked & bit:
+                    continue
+                blocked |= bit
+                revealed |= bit
+                if counts[n] == 0:
+                    stack.append(n)
+        return revealed
@@ -0,0 +1,109 @@
+# daily.py
+"""
+每日挑战：每天每个难度一张固定棋盘，各会话独立游玩。
+布局、起始挖开区域和各皮肤的首帧每天只生成一次，所有对局只读共享，
+每局只持有自己的挖开 / 标记位集。
+"""
+
+import asyncio
+import random
+import time
+import zlib
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from .board import BoardLayout
+from .model import GameSpec
+
+
+@dataclass(frozen=True, slots=True)
+class DailyBoard:
+    # YYYYMMDD
+    day: int
+    layout: BoardLayout
+    # 开局即挖开的区域（保证首步不踩雷）
+    start: int
+
+    @property
+    def label(self) -> str:
+        d = str(self.day)
+        return f"{d[:4]}-{d[4:6]}-{d[6:]}"
+
+
+def today(now: float | None = None) -> int:
+    """本地日期 YYYYMMDD"""
+    return int(time.strftime("%Y%m%d", time.localtime(now)))
+
+
+def build_board(day: int, spec: GameSpec) -> DailyBoard:
+    """
+    由日期与规格确定性地生成棋盘，并选一块空白区域作为开局
+    """
+    seed = zlib.crc32(f"{day}:{spec.rows}x{spec.cols}x{spec.mines}".encode())
+    layout = BoardLayout.generate(spec, seed)
+
+    cells = list(range(spec.rows * spec.cols))
+    random.Random(seed).shuffle(cells)
+    safe = [i for i in cells if not layout.is_mine(i)]
+    if not safe:
+        return DailyBoard(day, layout, 0)
+
+    start = next((i for i in safe if layout.counts[i] == 0), safe[0])
+    opened = 1 << start
+    if layout.counts[start] == 0:
+        opened |= layout.flood(start, opened)
+    return DailyBoard(day, layout, opened)
+
+
+class DailyChallenge:
+    """
+    每日棋盘与首帧缓存：
+    - 棋盘按 (日期, 规格) 生成一次
+    - 首帧按 (日期, 规格, 皮肤) 渲染一次，并发开局共用同一个渲染任务
+    - 日期变更时丢弃之前的缓存（跨零点的旧对局按日期重新生成同一布局）
+    """
+
+    def __init__(self):
+        self._boards: dict[tuple[int, GameSpec], DailyBoard] = {}
+        self._frames: dict[tuple[int, GameSpec, str], asyncio.Future[bytes]] = {}
+        self._day = 0
+
+    def board(self, spec: GameSpec, day: int | None = None) -> DailyBoard:
+        day = today() if day is None else day
+        if day > self._day:
+            self._day = day
+            self._prune(day)
+
+        key = (day, spec)
+        board = self._boards.get(key)
+        if board is None:
+            board = self._boards[key] = build_board(day, spec)
+        return board
+
+    async def frame(
+        self,
+        board: DailyBoard,
+        skin_name: str,
+        render: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        """
+        取共享首帧，首次请求时调用 render 生成
+        """
+        key = (board.day, board.layout.spec, skin_name)
+        future = self._frames.get(key)
+        if future is None:
+            future = asyncio.ensure_future(render())
+            self._frames[key] = future
+            future.add_done_callback(lambda f: self._drop_failed(key, f))
+        return await asyncio.shield(future)
+
+    def _drop_failed(self, key: tuple, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            if self._frames.get(key) is future:
+                del self._frames[key]
+
+    def _prune(self, day: int):
+        for key in [k for k in self._boards if k[0] < day]:
+            del self._boards[key]
+        for key in [k for k in self._frames if k[0] < day]:
+            del self._frames[key]
@@ -0,0 +1,383 @@
+# endless.py
+"""
+无尽扫雷：以 A1 为原点向右下延伸的超大棋盘，没有胜利，踩雷前挖开的格子数即得分。
+- 棋盘按 CHUNK x CHUNK 分块稀疏存储，只有挖开 / 标记过格子的分块才持有状态
+- 每块的雷由 (种子, 分块坐标) 确定性生成，首次读取时才计算并缓存，
+  计算边界格的雷数只读取相邻块的雷，不会为其建立状态
+- 渲染只取玩家最近落子位置周围的视口
+- 视口外的分块压缩为字节串，再次触及时解压
+"""
+
+import random
+import sys
+import time
+import zlib
+from collections.abc import Callable
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from .model import (
+    GameSpec,
+    GameState,
+    MarkResult,
+    MoveOp,
+    OpenResult,
+    Quality,
+    Tile,
+)
+from .parser import MAX_ROWS as MAX_LABEL_ROWS
+from .textboard import render_text
+
+if TYPE_CHECKING:
+    from .renderer import MineSweeperRenderer
+
+# 分块边长
+CHUNK = 16
+_CELLS = CHUNK * CHUNK
+_CHUNK_BYTES = _CELLS // 8
+
+# 坐标上限：行 A..ZZ，列 1..999（只是坐标范围，内存只随挖开的区域增长）
+MAX_ROWS = MAX_LABEL_ROWS
+MAX_COLS = 999
+# 解析坐标使用的棋盘边界
+ENDLESS_SPEC = GameSpec(MAX_ROWS, MAX_COLS, 0)
+
+# 雷密度范围：过低时空白区连成一片，一次展开可能波及整个棋盘
+MIN_DENSITY = 0.12
+MAX_DENSITY = 0.5
+
+
+@lru_cache(maxsize=1024)
+def chunk_mines(seed: int, mines: int, cx: int, cy: int) -> int:
+    """
+    分块 (cx, cy) 的雷位集，块内下标 i = 行 * CHUNK + 列
+    """
+    if cx < 0 or cy < 0:
+        return 0
+    rng = random.Random(f"{seed}:{cx}:{cy}")
+    mask = 0
+    for i in rng.sample(range(_CELLS), mines):
+        mask |= 1 << i
+    return mask
+
+
+def _is_mine(seed: int, mines: int, x: int, y: int) -> bool:
+    if not (0 <= x < MAX_ROWS and 0 <= y < MAX_COLS):
+        return False
+    mask = chunk_mines(seed, mines, x // CHUNK, y // CHUNK)
+    return bool(mask >> (x % CHUNK * CHUNK + y % CHUNK) & 1)
+
+
+@lru_cache(maxsize=256)
+def chunk_counts(seed: int, mines: int, cx: int, cy: int) -> bytes:
+    """
+    分块 (cx, cy) 每格周围的雷数（跨块边界读取相邻块的雷）
+    """
+    counts = bytearray(_CELLS)
+    x0, y0 = cx * CHUNK, cy * CHUNK
+    for i in range(_CELLS):
+        x, y = x0 + i // CHUNK, y0 + i % CHUNK
+        counts[i] = sum(
+            _is_mine(seed, mines, nx, ny)
+            for nx in (x - 1, x, x + 1)
+            for ny in (y - 1, y, y + 1)
+            if (nx, ny) != (x, y)
+        )
+    return bytes(counts)
+
+
+class _Chunk:
+    __slots__ = ("opened", "flagged")
+
+    def __init__(self, opened: int = 0, flagged: int = 0):
+        self.opened = opened
+        self.flagged = flagged
+
+    def pack(self) -> bytes:
+        return zlib.compress(
+            self.opened.to_bytes(_CHUNK_BYTES, "little")
+            + self.flagged.to_bytes(_CHUNK_BYTES, "little")
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "_Chunk":
+        raw = zlib.decompress(data)
+        return cls(
+            int.from_bytes(raw[:_CHUNK_BYTES], "little"),
+            int.from_bytes(raw[_CHUNK_BYTES:], "little"),
+        )
+
+
+class EndlessGame:
+    """
+    无尽扫雷对局，对外接口与 MineSweeper 一致（play / draw / 监听），
+    由 GameManager 按普通本地游戏调度；不支持快照休眠与 GUI
+    """
+
+    def __init__(
+        self,
+        view: GameSpec,
+        renderer: "MineSweeperRenderer",
+        density: float = 0.18,
+        seed: int | None = None,
+        skin_name: str = "",
+    ):
+        # 坐标边界（解析落子用），实际渲染范围为 view
+        self.spec = ENDLESS_SPEC
+        self.view = view
+        self.renderer = renderer
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.skin_name = skin_name
+        density = min(max(density, MIN_DENSITY), MAX_DENSITY)
+        # 每块的雷数
+        self.chunk_mine_count = round(_CELLS * density)
+
+        self.start_time = time.time()
+        self.state = GameState.GAMING
+        self.daily = 0
+        # 挖开的安全格数
+        self.score = 0
+        self.boom: tuple[int, int] | None = None
+        # 玩家最近落子的位置，视口以此为中心
+        self.focus = (0, 0)
+
+        # (cx, cy) -> 分块状态，视口外的分块压缩为字节串
+        self._chunks: dict[tuple[int, int], _Chunk | bytes] = {}
+        self._live: set[tuple[int, int]] = set()
+
+        self._listeners: list[Callable[[], None]] = []
+        self._open_start()
+
+    # ========= 状态 =========
+
+    @property
+    def is_win(self) -> bool:
+        return False
+
+    @property
+    def is_fail(self) -> bool:
+        return self.state == GameState.FAIL
+
+    @property
+    def is_over(self) -> bool:
+        return self.is_fail
+
+    @property
+    def is_gaming(self) -> bool:
+        return self.state == GameState.GAMING
+
+    @property
+    def origin(self) -> tuple[int, int]:
+        """视口左上角的全局坐标"""
+        x, y = self.focus
+        rows, cols = self.view.rows, self.view.cols
+        return (
+            min(max(x - rows // 2, 0), MAX_ROWS - rows),
+            min(max(y - cols // 2, 0), MAX_COLS - cols),
+        )
+
+    @property
+    def tiles(self) -> list[list[Tile]]:
+        """
+        视口内的只读格子视图（不解压、不新建分块）
+        """
+        x0, y0 = self.origin
+        failed = self.is_fail
+        result = []
+        for x in range(x0, x0 + self.view.rows):
+            row = []
+            for y in range(y0, y0 + self.view.cols):
+                chunk, bit = self._peek(x, y)
+                mine = self.is_mine(x, y)
+                opened = bool(chunk.opened & bit)
+                marked = bool(chunk.flagged & bit)
+                row.append(
+                    Tile(
+                        is_mine=mine,
+                        # 失败时揭示视口内的雷与错误的标记
+                        is_open=opened or failed and (mine or marked),
+                        marked=marked,
+                        boom=(x, y) == self.boom,
+                        count=self.count(x, y),
+                    )
+                )
+            result.append(row)
+        return result
+
+    def in_view(self, x: int, y: int) -> bool:
+        """是否在当前视口内"""
+        x0, y0 = self.origin
+        return x0 <= x < x0 + self.view.rows and y0 <= y < y0 + self.view.cols
+
+    def is_mine(self, x: int, y: int) -> bool:
+        return _is_mine(self.seed, self.chunk_mine_count, x, y)
+
+    def count(self, x: int, y: int) -> int:
+        counts = chunk_counts(
+            self.seed, self.chunk_mine_count, x // CHUNK, y // CHUNK
+        )
+        return counts[x % CHUNK * CHUNK + y % CHUNK]
+
+    # ========= 监听 =========
+
+    def add_listener(self, cb: Callable[[], None]):
+        self._listeners.append(cb)
+
+    def remove_listener(self, cb: Callable[[], None]):
+        if cb in self._listeners:
+            self._listeners.remove(cb)
+
+    def _notify(self):
+        for cb in list(self._listeners):
+            cb()
+
+    # ========= 对外 =========
+
+    def draw(self, quality: Quality = Quality.FULL) -> bytes:
+        """
+        渲染玩家位置周围的视口
+        """
+        return self.renderer.render(
+            tiles=self.tiles,
+            state=self.state,
+            start_time=self.start_time,
+            origin=self.origin,
+            counter=min(self.score, 999),
+            quality=quality,
+        )
+
+    def draw_text(self) -> str:
+        """视口的文字棋盘"""
+        return render_text(self.tiles, self.origin)
+
+    def memory_footprint(self) -> int:
+        """
+        本局独占的分块位集大小（字节），只随触及过的分块增长；不含渲染器与皮肤
+        """
+        size = sys.getsizeof(self._chunks) + sys.getsizeof(self._live)
+        for chunk in self._chunks.values():
+            size += sys.getsizeof(chunk)
+            if isinstance(chunk, _Chunk):
+                size += sys.getsizeof(chunk.opened) + sys.getsizeof(chunk.flagged)
+        return size
+
+    # ========= 游戏逻辑 =========
+
+    def open(self, x: int, y: int) -> OpenResult | None:
+        if not self._is_valid(x, y):
+            return OpenResult.OUT
+
+        chunk, bit = self._cell(x, y)
+        if chunk.opened & bit:
+            return OpenResult.DUP
+
+        self.focus = (x, y)
+        if self.is_mine(x, y):
+            chunk.opened |= bit
+            self.boom = (x, y)
+            self.state = GameState.FAIL
+            return OpenResult.FAIL
+
+        self._reveal(x, y, chunk, bit)
+        self._notify()
+        return None
+
+    def mark(self, x: int, y: int) -> MarkResult | None:
+        if not self._is_valid(x, y):
+            return MarkResult.OUT
+
+        chunk, bit = self._cell(x, y)
+        if chunk.opened & bit:
+            return MarkResult.OPENED
+
+        self.focus = (x, y)
+        chunk.flagged ^= bit
+        self._notify()
+        return None
+
+    def play(
+        self, op: MoveOp, moves: list[tuple[int, int]]
+    ) -> list[OpenResult | MarkResult | None]:
+        """
+        批量落子，结束后压缩视口外的分块
+        """
+        action = self.open if op == MoveOp.OPEN else self.mark
+        results = []
+        for x, y in moves:
+            results.append(action(x, y))
+            if self.is_over:
+                break
+        self._compact()
+        return results
+
+    # ========= 内部实现 =========
+
+    def _open_start(self):
+        """
+        在左上角区域选一块空白格挖开作为开局（保证首步不踩雷）
+        """
+        cells = [(x, y) for x in range(CHUNK * 2) for y in range(CHUNK * 2)]
+        random.Random(self.seed).shuffle(cells)
+        safe = [c for c in cells if not self.is_mine(*c)]
+        x, y = next((c for c in safe if self.count(*c) == 0), safe[0])
+        chunk, bit = self._cell(x, y)
+        self.focus = (x, y)
+        self._reveal(x, y, chunk, bit)
+
+    def _reveal(self, x: int, y: int, chunk: _Chunk, bit: int):
+        """
+        挖开安全格，空白格向外展开（可跨越分块边界）
+        """
+        chunk.opened |= bit
+        chunk.flagged &= ~bit
+        self.score += 1
+        if self.count(x, y):
+            return
+
+        stack = [(x, y)]
+        while stack:
+            px, py = stack.pop()
+            # 空白格的邻格都不是雷，只有真正被挖开的格子所在分块才会建立状态
+            for nx in range(max(px - 1, 0), min(px + 2, MAX_ROWS)):
+                for ny in range(max(py - 1, 0), min(py + 2, MAX_COLS)):
+                    chunk, bit = self._cell(nx, ny)
+                    if chunk.opened & bit:
+                        continue
+                    chunk.opened |= bit
+                    chunk.flagged &= ~bit
+                    self.score += 1
+                    if self.count(nx, ny) == 0:
+                        stack.append((nx, ny))
+
+    def _cell(self, x: int, y: int) -> tuple[_Chunk, int]:
+        """取格子所在分块（按需新建或解压）与块内位"""
+        key = (x // CHUNK, y // CHUNK)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = _Chunk()
+            self._live.add(key)
+        elif isinstance(chunk, bytes):
+            chunk = self._chunks[key] = _Chunk.unpack(chunk)
+            self._live.add(key)
+        return chunk, 1 << (x % CHUNK * CHUNK + y % CHUNK)
+
+    def _peek(self, x: int, y: int) -> tuple[_Chunk, int]:
+        """只读取格子状态，不改变分块的存储形式"""
+        chunk = self._chunks.get((x // CHUNK, y // CHUNK))
+        if chunk is None:
+            chunk = _Chunk()
+        elif isinstance(chunk, bytes):
+            chunk = _Chunk.unpack(chunk)
+        return chunk, 1 << (x % CHUNK * CHUNK + y % CHUNK)
+
+    def _compact(self):
+        """压缩与视口（外扩一块）不相交的分块"""
+        x0, y0 = self.origin
+        rows = range(x0 // CHUNK - 1, (x0 + self.view.rows - 1) // CHUNK + 2)
+        cols = range(y0 // CHUNK - 1, (y0 + self.view.cols - 1) // CHUNK + 2)
+        for key in [k for k in self._live if k[0] not in rows or k[1] not in cols]:
+            self._live.discard(key)
+            self._chunks[key] = self._chunks[key].pack()
+
+    def _is_valid(self, x: int, y: int) -> bool:
+        return 0 <= x < MAX_ROWS and 0 <= y < MAX_COLS
@@ -0,0 +1,65 @@
+# expiry.py
+import heapq
+import itertools
+import time
+from collections.abc import Hashable
+
+
+class ExpiryHeap:
+    """
+    基于最小堆的过期表：
+    - touch 刷新键的过期时间，旧堆节点不删除，出堆时惰性丢弃
+    - 堆中失效节点过多时整体重建，防止频繁 touch 撑大堆
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._deadlines: dict[Hashable, float] = {}
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def touch(self, key: Hashable, now: float | None = None):
+        """刷新过期时间"""
+        deadline = (time.time() if now is None else now) + self.ttl
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._rebuild()
+
+    def discard(self, key: Hashable):
+        """移除键（堆节点惰性清理）"""
+        self._deadlines.pop(key, None)
+
+    def pop_expired(self, now: float | None = None) -> list[Hashable]:
+        """弹出所有已过期的键"""
+        now = time.time() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        return expired
+
+    def next_deadline(self) -> float | None:
+        """最近一个有效的过期时间"""
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def _rebuild(self):
+        self._heap = [
+            (deadline, next(self._counter), key)
+            for key, deadline in self._deadlines.items()
+        ]
+        heapq.heapify(self._heap)
@@ -1,41 +1,73 @@
 # game.py
+import asyncio
+import concurrent.futures
 import random
-import threading
+import sys
 import time
-from collections.abc import Callable, Iterator
-
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from .actor import SessionActor
+from .board import BoardLayout, BoardMetrics, bits
+from .expiry import ExpiryHeap
 from .model import (
     GameSpec,
     GameState,
     MarkResult,
+    MoveOp,
     OpenResult,
+    Quality,
     Tile,
 )
-from .renderer import MineSweeperRenderer
+from .shard import RemoteGame
+from .snapshot import GameSnapshot, SnapshotStore, decode_snapshot, encode_snapshot
+from .textboard import render_text
+
+if TYPE_CHECKING:
+    from .renderer import MineSweeperRenderer
 
 
 class MineSweeper:
     """
     扫雷核心逻辑（纯规则 / 纯状态）
+    - 布局（雷与周围雷数）只读，可与其他对局共享；每局只持有挖开 / 标记位集
+    - 非线程安全：所有修改都应经由 GameManager.submit 串行执行
     """
 
     def __init__(
         self,
         spec: GameSpec,
-        renderer: MineSweeperRenderer,
+        renderer: "MineSweeperRenderer",
+        seed: int | None = None,
+        skin_name: str = "",
+        layout: BoardLayout | None = None,
     ):
         self.spec = spec
         self.renderer = renderer
+        # 布雷随机种子，连同首次点击位置即可复现整局棋盘
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.skin_name = skin_name
 
         self.start_time = time.time()
-        self.state = GameState.PREPARE
-        self.tiles = [[Tile() for _ in range(spec.cols)] for _ in range(spec.rows)]
+        self.state = GameState.PREPARE if layout is None else GameState.GAMING
+        # 首次点击时才生成（共享布局的对局创建时即有）
+        self.layout = layout
+        self.opened = 0
+        self.flagged = 0
+        self.boom = -1
+        # 有效点击数（挖开 + 标记，含重复点击），用于计算效率
+        self.clicks = 0
+        # 每日挑战的日期（YYYYMMDD），普通对局为 0
+        self.daily = 0
+        # 最近一次展开的格子视图：((opened, flagged, boom, state), tiles)
+        self._tiles_cache: tuple[tuple, list[list[Tile]]] | None = None
 
         self._listeners: list[Callable[[], None]] = []
         self._send_board_listeners: list[Callable[[], None]] = []
 
-        self._lock = threading.Lock()
-
     # ========= 状态 =========
 
     @property
@@ -54,6 +86,44 @@ class MineSweeper:
     def is_gaming(self) -> bool:
         return self.state == GameState.GAMING
 
+    @property
+    def metrics(self) -> BoardMetrics | None:
+        """棋盘难度指标，首次点击布雷前为 None"""
+        return self.layout.metrics if self.layout else None
+
+    @property
+    def tiles(self) -> list[list[Tile]]:
+        """
+        按格子展开的只读视图（渲染 / GUI / 文字棋盘使用）
+        状态未变时复用上次展开的结果，调用方不得修改
+        """
+        key = (self.opened, self.flagged, self.boom, self.state)
+        if self._tiles_cache and self._tiles_cache[0] == key:
+            return self._tiles_cache[1]
+
+        rows, cols = self.spec.rows, self.spec.cols
+        n = rows * cols
+        layout = self.layout
+        mines = bits(layout.mines if layout else 0, n)
+        counts = layout.counts if layout else bytes(n)
+        opened = bits(self.opened, n)
+        flagged = bits(self.flagged, n)
+        tiles = [
+            [
+                Tile(
+                    is_mine=mines[i] == "1",
+                    is_open=opened[i] == "1",
+                    marked=flagged[i] == "1",
+                    boom=i == self.boom,
+                    count=counts[i],
+                )
+                for i in range(x * cols, (x + 1) * cols)
+            ]
+            for x in range(rows)
+        ]
+        self._tiles_cache = (key, tiles)
+        return tiles
+
     # ========= 监听 =========
 
     def add_listener(self, cb: Callable[[], None]):
@@ -77,7 +147,7 @@ class MineSweeper:
 
     # ========= 对外 =========
 
-    def draw(self) -> bytes:
+    def draw(self, quality: Quality = Quality.FULL) -> bytes:
         """
         渲染当前棋盘
         """
@@ -85,163 +155,418 @@ class MineSweeper:
             tiles=self.tiles,
             state=self.state,
             start_time=self.start_time,
+            quality=quality,
         )
 
-    # ========= 游戏逻辑 =========
-
-    def open(self, x: int, y: int) -> OpenResult | None:
-        with self._lock:
-            if not self._is_valid(x, y):
-                return OpenResult.OUT
-
-            tile = self.tiles[x][y]
-
-            if tile.is_open:
-                return OpenResult.DUP
+    def draw_text(self) -> str:
+        """文字棋盘"""
+        return render_text(self.tiles)
 
-            tile.is_open = True
-
-            # 首次点击才布雷
-            if self.state == GameState.PREPARE:
-                self._set_mines(exclude=(x, y))
-
-            if tile.is_mine:
-                tile.boom = True
-                self.state = GameState.FAIL
-                self._reveal_mines()
-                return OpenResult.FAIL
+    def memory_footprint(self) -> int:
+        """
+        本局独占的棋盘位集大小（字节），共享布局不计入；
+        渲染器、皮肤、监听与执行器等不在其中，整局常驻内存见 bench/loadtest.py
+        """
+        size = sys.getsizeof(self.opened) + sys.getsizeof(self.flagged)
+        if self.layout and not self.daily:
+            size += sys.getsizeof(self.layout.mines)
+            size += sys.getsizeof(self.layout.counts)
+        return size
 
-            if tile.count == 0:
-                self._spread(x, y)
+    # ========= 游戏逻辑 =========
 
-            if self._check_win():
-                self.state = GameState.WIN
-                self._reveal_mines()
-                return OpenResult.WIN
+    def open(self, x: int, y: int) -> OpenResult | None:
+        if not self._is_valid(x, y):
+            return OpenResult.OUT
+
+        self.clicks += 1
+        i = x * self.spec.cols + y
+        bit = 1 << i
+
+        if self.opened & bit:
+            return OpenResult.DUP
+
+        self.opened |= bit
+
+        # 首次点击才布雷
+        if self.layout is None:
+            self.layout = BoardLayout.generate(self.spec, self.seed, exclude=i)
+            self.state = GameState.GAMING
+        layout = self.layout
+
+        if layout.mines & bit:
+            self.boom = i
+            self.state = GameState.FAIL
+            self._reveal_mines()
+            return OpenResult.FAIL
+
+        if layout.counts[i] == 0:
+            revealed = layout.flood(i, self.opened)
+            self.opened |= revealed
+            self.flagged &= ~revealed
+
+        if self._check_win():
+            self.state = GameState.WIN
+            self._reveal_mines()
+            return OpenResult.WIN
         self._notify()
         return None
 
     def mark(self, x: int, y: int) -> MarkResult | None:
-        with self._lock:
-            if not self._is_valid(x, y):
-                return MarkResult.OUT
+        if not self._is_valid(x, y):
+            return MarkResult.OUT
 
-            tile = self.tiles[x][y]
+        self.clicks += 1
+        bit = 1 << (x * self.spec.cols + y)
 
-            if tile.is_open:
-                return MarkResult.OPENED
+        if self.opened & bit:
+            return MarkResult.OPENED
 
-            tile.marked = not tile.marked
+        self.flagged ^= bit
 
-            if self._check_mark_win():
-                self.state = GameState.WIN
-                self._reveal_mines()
-                return MarkResult.WIN
+        if self._check_mark_win():
+            self.state = GameState.WIN
+            self._reveal_mines()
+            return MarkResult.WIN
         self._notify()
         return None
 
+    def play(
+        self, op: MoveOp, moves: list[tuple[int, int]]
+    ) -> list[OpenResult | MarkResult | None]:
+        """
+        批量落子，游戏结束后不再处理剩余坐标
+        """
+        action = self.open if op == MoveOp.OPEN else self.mark
+        results = []
+        for x, y in moves:
+            results.append(action(x, y))
+            if self.is_over:
+                break
+        return results
+
     # ========= 内部实现 =========
 
-    def _all_tiles(self) -> Iterator[Tile]:
-        for row in self.tiles:
-            yield from row
+    def _reveal_mines(self):
+        mines = self.layout.mines if self.layout else 0
+        self.opened |= mines | self.flagged
 
-    def _set_mines(self, exclude: tuple[int, int]):
-        """
-        布雷，保证首次点击不会踩雷
-        """
-        ex, ey = exclude
-        count = 0
+    def _check_win(self) -> bool:
+        total = self.spec.rows * self.spec.cols
+        return self.opened.bit_count() + self.spec.mines >= total
 
-        while count < self.spec.mines:
-            x = random.randrange(self.spec.rows)
-            y = random.randrange(self.spec.cols)
+    def _check_mark_win(self) -> bool:
+        mines = self.layout.mines if self.layout else 0
+        flagged = self.flagged
+        return flagged.bit_count() == self.spec.mines and not flagged & ~mines
 
-            if (x, y) == (ex, ey):
-                continue
+    def _is_valid(self, x: int, y: int) -> bool:
+        return 0 <= x < self.spec.rows and 0 <= y < self.spec.cols
 
-            tile = self.tiles[x][y]
-            if tile.is_mine:
-                continue
 
-            tile.is_mine = True
-            count += 1
+class GameManager:
+    """
+    多扫雷实例管理：
+    - 游戏可以是本地 MineSweeper，也可以是托管在分片进程中的 RemoteGame
+    - 每个会话一个 SessionActor，落子、渲染、发送按提交顺序串行执行
+    - 渲染放到共享线程池，不阻塞事件循环
+    - 闲置超时的游戏由外部定期清理
+    - 闲置较久的游戏休眠到磁盘，下次 get 时透明恢复
+    - 游戏变更后延迟批量写入快照（write-behind）
+    """
 
-        for x in range(self.spec.rows):
-            for y in range(self.spec.cols):
-                self.tiles[x][y].count = self._count_around(x, y)
-
-        self.state = GameState.GAMING
-
-    def _neighbors(self):
-        return (
-            (-1, -1),
-            (0, -1),
-            (1, -1),
-            (-1, 0),
-            (1, 0),
-            (-1, 1),
-            (0, 1),
-            (1, 1),
+    def __init__(
+        self,
+        idle_ttl: float = 1800,
+        hibernate_after: float = 300,
+        store: SnapshotStore | None = None,
+        factory: Callable[[GameSnapshot], MineSweeper] | None = None,
+        inbox_size: int = 16,
+        render_workers: int = 2,
+        on_stop: Callable[[str], None] | None = None,
+        on_restore: Callable[[str, GameSnapshot], None] | None = None,
+    ):
+        self.games: dict[str, MineSweeper | RemoteGame] = {}
+        # key -> 发起游戏的会话（unified_msg_origin），用于超时通知
+        self.origins: dict[str, str] = {}
+        # key -> 玩家昵称 -> 落子数（合作模式的贡献统计）
+        self.contributions: dict[str, Counter[str]] = {}
+        self._expiry = ExpiryHeap(idle_ttl)
+        # 游戏结束回调（归还准入名额等）
+        self._on_stop = on_stop
+        # 重载时从快照登记游戏的回调（占用准入名额等）
+        self._on_restore = on_restore
+
+        # 快照与休眠
+        self._store = store
+        self._factory = factory
+        self._idle = ExpiryHeap(hibernate_after)
+        self._hibernated: set[str] = set()
+        # 不可休眠的游戏（如已打开 GUI 窗口）
+        self._pinned: set[str] = set()
+        self._dirty: set[str] = set()
+        # key -> 待写入的快照（None 表示删除）
+        self._pending: dict[str, bytes | None] = {}
+        self._writing: dict[str, bytes | None] = {}
+
+        # 会话执行器
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._inbox_size = inbox_size
+        self._actors: dict[str, SessionActor] = {}
+        self._render_pool = ThreadPoolExecutor(
+            max_workers=render_workers, thread_name_prefix="minesweeper-render"
         )
 
-    def _count_around(self, x: int, y: int) -> int:
-        return sum(
-            1
-            for dx, dy in self._neighbors()
-            if self._is_valid(x + dx, y + dy) and self.tiles[x + dx][y + dy].is_mine
-        )
+    def create(
+        self,
+        key: str,
+        game: MineSweeper | RemoteGame,
+        origin: str = "",
+        pinned: bool = False,
+    ) -> MineSweeper | RemoteGame:
+        self._attach(key, game)
+        self.origins[key] = origin
+        if pinned:
+            self._pinned.add(key)
+        self._dirty.add(key)
+        return game
 
-    def _spread(self, x: int, y: int):
-        for dx, dy in self._neighbors():
-            nx, ny = x + dx, y + dy
-            if not self._is_valid(nx, ny):
-                continue
+    def get(self, key: str) -> MineSweeper | RemoteGame | None:
+        game = self.games.get(key)
+        if game is None and key in self._hibernated:
+            game = self._thaw(key)
+        if game:
+            self._expiry.touch(key)
+            self._idle.touch(key)
+        return game
+
+    def stop(self, key: str):
+        game = self.games.pop(key, None)
+        if isinstance(game, RemoteGame):
+            game.close()
+        self.origins.pop(key, None)
+        self.contributions.pop(key, None)
+        self._hibernated.discard(key)
+        self._pinned.discard(key)
+        self._dirty.discard(key)
+        self._expiry.discard(key)
+        self._idle.discard(key)
+        if self._store:
+            self._pending[key] = None
+        if self._on_stop:
+            self._on_stop(key)
+
+    def is_running(self, key: str) -> bool:
+        return key in self.games or key in self._hibernated
+
+    def record_moves(self, key: str, player: str, count: int):
+        """记录玩家的落子数"""
+        self.contributions.setdefault(key, Counter())[player] += count
 
-            tile = self.tiles[nx][ny]
-            if tile.is_open or tile.is_mine:
+    def evict_expired(
+        self, now: float | None = None
+    ) -> list[tuple[str, str, MineSweeper | RemoteGame | None]]:
+        """
+        移除闲置超时的游戏，返回 (key, origin, game)，已休眠的游戏 game 为 None
+        """
+        evicted = []
+        for key in self._expiry.pop_expired(now):
+            if not self.is_running(key):
                 continue
+            evicted.append((key, self.origins.get(key, ""), self.games.get(key)))
+            self.stop(key)
+
+        # 顺带回收已结束会话的空闲执行器
+        for key in [k for k, a in self._actors.items() if a.idle]:
+            if not self.is_running(key):
+                del self._actors[key]
+        return evicted
+
+    def next_deadline(self) -> float | None:
+        deadlines = [
+            d
+            for d in (self._expiry.next_deadline(), self._idle.next_deadline())
+            if d is not None
+        ]
+        return min(deadlines, default=None)
+
+    # ========= 执行器 =========
+
+    def pending(self, key: str) -> int:
+        """会话执行器中排队的任务数"""
+        actor = self._actors.get(key)
+        return actor.pending if actor else 0
+
+    def submit(
+        self, key: str, job: Callable[[MineSweeper | RemoteGame], Any]
+    ) -> asyncio.Future:
+        """
+        在会话执行器中运行 job(game)，游戏不存在时结果为 None
+        收件箱已满时抛出 asyncio.QueueFull
+        """
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
 
-            tile.is_open = True
-            tile.marked = False
+        actor = self._actors.get(key)
+        if actor is None:
+            actor = self._actors[key] = SessionActor(self._inbox_size)
 
-            if tile.count == 0:
-                self._spread(nx, ny)
+        def run():
+            game = self.get(key)
+            return job(game) if game else None
 
-    def _reveal_mines(self):
-        for tile in self._all_tiles():
-            if tile.is_mine or tile.marked:
-                tile.is_open = True
+        return actor.submit(run)
 
-    def _check_win(self) -> bool:
-        opened = sum(1 for t in self._all_tiles() if t.is_open)
-        return opened + self.spec.mines >= self.spec.rows * self.spec.cols
+    def submit_threadsafe(
+        self, key: str, job: Callable[[MineSweeper | RemoteGame], Any]
+    ) -> concurrent.futures.Future:
+        """
+        供其它线程（如 GUI）提交任务
+        """
+        if self.loop is None:
+            raise RuntimeError("GameManager 尚未绑定事件循环")
 
-    def _check_mark_win(self) -> bool:
-        marked = [t for t in self._all_tiles() if t.marked]
-        return len(marked) == self.spec.mines and all(t.is_mine for t in marked)
+        async def wrapper():
+            return await self.submit(key, job)
 
-    def _is_valid(self, x: int, y: int) -> bool:
-        return 0 <= x < self.spec.rows and 0 <= y < self.spec.cols
+        return asyncio.run_coroutine_threadsafe(wrapper(), self.loop)
 
+    def render(
+        self, game: MineSweeper | RemoteGame, quality: Quality = Quality.FULL
+    ) -> Awaitable[bytes]:
+        """
+        在渲染线程池（或分片进程）中绘制棋盘
+        应在执行器任务内调用，保证期间无修改
+        """
+        if isinstance(game, RemoteGame):
+            return game.draw(quality)
+        loop = self.loop or asyncio.get_running_loop()
+        return loop.run_in_executor(self._render_pool, game.draw, quality)
 
-class GameManager:
-    """
-    多扫雷实例管理
-    """
+    async def apply(
+        self,
+        game: MineSweeper | RemoteGame,
+        op: MoveOp,
+        moves: list[tuple[int, int]],
+        render: bool = True,
+        quality: Quality = Quality.FULL,
+    ) -> tuple[list[OpenResult | MarkResult | None], bytes | None]:
+        """
+        落子并按需渲染，返回 (每步结果, 图片)
+        """
+        if isinstance(game, RemoteGame):
+            return await game.play(op, moves, render, quality)
+        results = game.play(op, moves)
+        image = await self.render(game, quality) if render else None
+        return results, image
 
-    def __init__(self):
-        self.games: dict[str, MineSweeper] = {}
+    def shutdown(self):
+        self._render_pool.shutdown(wait=False, cancel_futures=True)
 
-    def create(self, key: str, game: MineSweeper) -> MineSweeper:
+    # ========= 快照 / 休眠 =========
+
+    def _attach(self, key: str, game: MineSweeper | RemoteGame):
         self.games[key] = game
+        self._hibernated.discard(key)
+        game.add_listener(partial(self._dirty.add, key))
+        self._expiry.touch(key)
+        self._idle.touch(key)
+
+    def hibernate_idle(self, now: float | None = None) -> int:
+        """
+        将闲置的游戏写入快照并释放内存，返回休眠数量
+        """
+        if self._store is None or self._factory is None:
+            return 0
+
+        count = 0
+        for key in self._idle.pop_expired(now):
+            game = self.games.get(key)
+            if not isinstance(game, MineSweeper) or key in self._pinned:
+                continue
+            self._pending[key] = encode_snapshot(game, self.origins.get(key, ""))
+            del self.games[key]
+            self._dirty.discard(key)
+            self._hibernated.add(key)
+            count += 1
+        return count
+
+    def _thaw(self, key: str) -> MineSweeper | None:
+        """从快照恢复休眠中的游戏"""
+        if key in self._pending:
+            data = self._pending[key]
+        elif key in self._writing:
+            data = self._writing[key]
+        else:
+            data = self._store.read(key) if self._store else None
+
+        try:
+            if data is None or self._factory is None:
+                raise ValueError("快照不存在")
+            game = self._factory(decode_snapshot(data))
+        except Exception:
+            # 快照损坏或皮肤已不存在，放弃该局
+            self.stop(key)
+            return None
+
+        self._attach(key, game)
         return game
 
-    def get(self, key: str) -> MineSweeper | None:
-        return self.games.get(key)
+    async def flush(self):
+        """
+        将变更过的游戏批量写入快照
+        """
+        if self._store is None:
+            return
+
+        for key in self._dirty:
+            game = self.games.get(key)
+            if isinstance(game, MineSweeper):
+                self._pending[key] = encode_snapshot(game, self.origins.get(key, ""))
+        self._dirty.clear()
+        if not self._pending:
+            return
+
+        self._writing, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._store.write_batch, self._writing)
+        except Exception:
+            # 写入失败时放回队列，下次重试；期间产生的更新快照优先
+            # 已休眠的游戏只剩这份快照，丢弃即无法恢复
+            self._pending = {**self._writing, **self._pending}
+            self._writing = {}
+            raise
+        self._writing = {}
+
+    def persist_all(self):
+        """标记所有在内存中的游戏待写入"""
+        self._dirty.update(self.games)
+
+    async def restore_all(self) -> int:
+        """
+        载入磁盘上的全部快照，以休眠状态登记，首次访问时重建
+        """
+        if self._store is None:
+            return 0
 
-    def stop(self, key: str):
-        self.games.pop(key, None)
+        blobs = await asyncio.to_thread(self._store.read_all)
+        count = 0
+        for key, data in blobs.items():
+            if key in self.games:
+                continue
+            try:
+                snap = decode_snapshot(data)
+            except Exception:
+                self._pending[key] = None
+                continue
+            if snap.state in (GameState.WIN, GameState.FAIL):
+                self._pending[key] = None
+                continue
 
-    def is_running(self, key: str) -> bool:
-        return key in self.games
+            self.origins[key] = snap.origin
+            self._hibernated.add(key)
+            self._expiry.touch(key)
+            if self._on_restore:
+                self._on_restore(key, snap)
+            count += 1
+        return count
@@ -1,27 +1,141 @@
 """
 Windows GUI for Minesweeper (View + Controller only)
 窗口缩放时棋盘等比缩放（修复首帧灰屏）
+棋盘直接使用皮肤贴图，每个格子一个画布图元，变化时只更新对应格子
+所有窗口共用一个 Tk 线程：GuiHost 持有唯一的 Tk 根窗口，每局游戏一个 Toplevel
 """
 
 
-from io import BytesIO
+import asyncio
+import math
+import queue
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
+from PIL.Image import Image as IMG
 from PIL.Image import Resampling
 
 from .game import MineSweeper
-from .model import GameState
+from .model import GameState, MarkResult, OpenResult, Tile
+from .parser import cell_label
+from .renderer import BOARD_X, BOARD_Y, SpriteKey
+
+
+# 把 job(game) 提交到游戏所在会话的执行器（线程安全）
+Submit = Callable[[Callable[[MineSweeper], Any]], Future]
+
+# 缩放比例按 1/4 取整，窗口拖动时复用同一套贴图
+SCALE_STEP = 4
+# 最多缓存几种缩放比例的贴图
+SCALE_CACHE_SIZE = 4
+# Tk 线程轮询投递队列的间隔（毫秒）
+POLL_INTERVAL = 30
+# 会话繁忙提示在标题栏停留的时长（毫秒）
+BUSY_HINT_MS = 2000
+
+TITLE = "扫雷游戏 - Minesweeper"
+
+
+@dataclass(frozen=True)
+class _View:
+    """在会话执行器中取出的棋盘快照，Tk 线程只读它，不直接读游戏"""
+
+    tiles: list[list[Tile]]
+    state: GameState
+    start_time: float
+
+    @classmethod
+    def of(cls, game: MineSweeper) -> "_View":
+        return cls(game.tiles, game.state, game.start_time)
+
+    @property
+    def is_over(self) -> bool:
+        return self.state in (GameState.WIN, GameState.FAIL)
+
+
+class GuiHost:
+    """
+    GUI 宿主线程：
+    - 首次打开窗口时启动，整个插件只有一个 Tk 解释器和一个 mainloop
+    - 其他线程通过 post 投递回调，由 Tk 线程定时从队列取出执行
+    """
+
+    def __init__(self):
+        self._queue: queue.SimpleQueue[Callable[[], Any]] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.root = None
+
+    def post(self, fn: Callable[[], Any]):
+        """线程安全：在 Tk 线程中执行 fn"""
+        self._queue.put(fn)
+
+    def open(self, game: MineSweeper, submit: Submit):
+        """为游戏打开一个窗口"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="minesweeper-gui", daemon=True
+                )
+                self._thread.start()
+        self.post(lambda: MineSweeperGUI(self, game, submit))
+
+    def close(self, timeout: float = 2):
+        """关闭全部窗口并结束 Tk 线程"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.post(self._quit)
+        thread.join(timeout)
+
+    def _run(self):
+        import tkinter as tk
+
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.root.after(POLL_INTERVAL, self._pump)
+        try:
+            self.root.mainloop()
+        finally:
+            self.root = None
+
+    def _pump(self):
+        while True:
+            try:
+                fn = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn()
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+            if self.root is None:
+                return
+        self.root.after(POLL_INTERVAL, self._pump)
+
+    def _quit(self):
+        root, self.root = self.root, None
+        root.destroy()
 
 
 class MineSweeperGUI:
-    def __init__(self, game: MineSweeper):
+    def __init__(self, host: GuiHost, game: MineSweeper, submit: Submit):
+        self.host = host
         self.game = game
         self.spec = game.spec
+        self.renderer = game.renderer
+        self.submit = submit
 
         import tkinter as tk
         # ========= Window =========
-        self.root = tk.Tk()
-        self.root.title("扫雷游戏 - Minesweeper")
+        self.root = tk.Toplevel(host.root)
+        self.root.title(TITLE)
         self.root.resizable(True, True)
 
         # ========= Top Bar =========
@@ -42,93 +156,191 @@ class MineSweeperGUI:
         self.canvas.bind("<Button-3>", self._on_right_click)
         self.canvas.bind("<Configure>", self._on_canvas_resize)
 
-        # ========= Render Cache =========
-        self.original_img: Image.Image | None = None
-        self.current_photo: ImageTk.PhotoImage | None = None
+        # ========= Sprite Cache =========
+        # scale -> 贴图 -> PhotoImage，仅在 Tk 线程中创建与访问
+        self._sprites: OrderedDict[float, dict[Any, ImageTk.PhotoImage]] = (
+            OrderedDict()
+        )
+        self._header_photo: ImageTk.PhotoImage | None = None
+
+        # ========= Board View =========
+        # 最近一次取到的棋盘快照，取到之前不绘制
+        self._view: _View | None = None
+
+        # ========= Canvas Items =========
+        self._tile_items: list[list[int]] = []
+        self._label_items: list[list[int]] = []
+        self._tile_keys: list[list[SpriteKey | None]] = []
+        self._header_item: int | None = None
 
         # ========= Scale Info =========
-        self.scale = 1.0
+        self.scale = 0.0
         self.offset_x = 0
         self.offset_y = 0
-
-        # ========= Click Mapping =========
-        self.tile_size = game.renderer.tile_size
-        self.board_offset_x = game.renderer.board_offset_x
-        self.board_offset_y = game.renderer.board_offset_y
+        self.tile_size = 0
 
         # ========= Listener =========
         self.game.add_listener(self._on_game_changed)
 
-        # ⚠️ 关键修复：等窗口布局完成再渲染
-        self.root.after_idle(self._update_display)
+        # ⚠️ 关键修复：取到棋盘快照（此时窗口布局已完成）再渲染
+        self._submit(_View.of)
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
     # ================= Events =================
 
     def _on_game_changed(self):
-        self.root.after(0, self._update_display)
+        # 在会话执行器的任务中调用，就地取快照后投递回 Tk 线程
+        self.host.post(partial(self._update_display, _View.of(self.game)))
 
     def _on_send_board_clicked(self):
         self.game.request_send_board()
 
     def _on_canvas_resize(self, event):
-        if self.original_img is not None:
-            self._render_scaled()
+        self._update_display()
 
-    # ================= Rendering =================
+    # ================= Sprites =================
 
-    def _update_display(self):
-        img_bytes = self.game.draw()
-        self.original_img = Image.open(BytesIO(img_bytes))
-        self._render_scaled()
+    def _fit_scale(self) -> float:
+        bg = self.renderer.skin.background
+        canvas_w = max(self.canvas.winfo_width(), 1)
+        canvas_h = max(self.canvas.winfo_height(), 1)
+        fit = min(canvas_w / bg.width, canvas_h / bg.height)
+        return max(math.floor(fit * SCALE_STEP), 1) / SCALE_STEP
+
+    def _photo(self, key: Any, img: IMG) -> ImageTk.PhotoImage:
+        """
+        取当前缩放比例下的贴图，首次使用时缩放并缓存
+        """
+        sprites = self._sprites[self.scale]
+        photo = sprites.get(key)
+        if photo is None:
+            size = (
+                max(1, round(img.width * self.scale)),
+                max(1, round(img.height * self.scale)),
+            )
+            photo = ImageTk.PhotoImage(img.resize(size, Resampling.NEAREST))
+            sprites[key] = photo
+        return photo
+
+    def _use_scale(self, scale: float):
+        self.scale = scale
+        if scale in self._sprites:
+            self._sprites.move_to_end(scale)
+        else:
+            self._sprites[scale] = {}
+            while len(self._sprites) > SCALE_CACHE_SIZE:
+                self._sprites.popitem(last=False)
 
-    def _render_scaled(self):
-        if self.original_img is None:
+    # ================= Rendering =================
+
+    def _update_display(self, view: _View | None = None):
+        if view is not None:
+            self._view = view
+        if self._view is None or not self.root.winfo_exists():
             return
+        scale = self._fit_scale()
+        if scale != self.scale or not self._tile_items:
+            self._use_scale(scale)
+            self._build_items()
+        else:
+            self._center()
+        self._update_header()
+        self._update_tiles()
+
+    def _build_items(self):
+        """
+        缩放比例变化时重建全部图元（背景、顶栏、格子、坐标）
+        """
         import tkinter as tk
 
+        self.canvas.delete("all")
+        self.offset_x = self.offset_y = 0
+
+        skin = self.renderer.skin
+        self.canvas.create_image(
+            0, 0, anchor=tk.NW, image=self._photo("background", skin.background)
+        )
+        self._header_item = self.canvas.create_image(0, 0, anchor=tk.NW)
+
+        self.tile_size = max(1, round(skin.numbers[0].width * self.scale))
+        x0 = round(BOARD_X * self.scale)
+        y0 = round(BOARD_Y * self.scale)
+        font = ("Arial", -max(1, round(7 * self.scale)))
+
+        self._tile_items = []
+        self._label_items = []
+        self._tile_keys = []
+        for i in range(self.spec.rows):
+            tiles, labels = [], []
+            for j in range(self.spec.cols):
+                x = x0 + self.tile_size * j
+                y = y0 + self.tile_size * i
+                tiles.append(self.canvas.create_image(x, y, anchor=tk.NW))
+                labels.append(
+                    self.canvas.create_text(
+                        x + self.tile_size / 2,
+                        y + self.tile_size / 2,
+                        text=cell_label(i, j),
+                        font=font,
+                        fill="black",
+                    )
+                )
+            self._tile_items.append(tiles)
+            self._label_items.append(labels)
+            self._tile_keys.append([None] * self.spec.cols)
+
+        self._center()
+
+    def _center(self):
+        bg = self.renderer.skin.background
         canvas_w = max(self.canvas.winfo_width(), 1)
         canvas_h = max(self.canvas.winfo_height(), 1)
+        offset_x = (canvas_w - round(bg.width * self.scale)) // 2
+        offset_y = (canvas_h - round(bg.height * self.scale)) // 2
+        if (offset_x, offset_y) != (self.offset_x, self.offset_y):
+            self.canvas.move(
+                "all", offset_x - self.offset_x, offset_y - self.offset_y
+            )
+            self.offset_x, self.offset_y = offset_x, offset_y
 
-        img_w, img_h = self.original_img.size
-        self.scale = min(canvas_w / img_w, canvas_h / img_h)
-
-        new_w = max(1, int(img_w * self.scale))
-        new_h = max(1, int(img_h * self.scale))
-
-        resized = self.original_img.resize(
-            (new_w, new_h),
-            Resampling.NEAREST,
+    def _update_header(self):
+        header = self.renderer.render_header(
+            tiles=self._view.tiles,
+            state=self._view.state,
+            start_time=self._view.start_time,
         )
-        self.current_photo = ImageTk.PhotoImage(resized)
-
-        self.offset_x = (canvas_w - new_w) // 2
-        self.offset_y = (canvas_h - new_h) // 2
-
-        self.canvas.delete("all")
-        self.canvas.create_image(
-            self.offset_x,
-            self.offset_y,
-            anchor=tk.NW,
-            image=self.current_photo,
+        size = (round(header.width * self.scale), round(header.height * self.scale))
+        self._header_photo = ImageTk.PhotoImage(
+            header.resize(size, Resampling.NEAREST)
         )
+        self.canvas.itemconfigure(self._header_item, image=self._header_photo)
+
+    def _update_tiles(self):
+        """
+        只重设贴图发生变化的格子
+        """
+        sprite_key = self.renderer.tile_sprite_key
+        for i, row in enumerate(self._view.tiles):
+            keys = self._tile_keys[i]
+            for j, t in enumerate(row):
+                key = sprite_key(t)
+                if key == keys[j]:
+                    continue
+                keys[j] = key
+                photo = self._photo(key, self.renderer.sprite(key))
+                self.canvas.itemconfigure(self._tile_items[i][j], image=photo)
+                self.canvas.itemconfigure(
+                    self._label_items[i][j],
+                    state="hidden" if t.is_open or t.marked else "normal",
+                )
 
     # ================= Input =================
 
     def _get_tile_position(self, x: int, y: int):
-        ox = x - self.offset_x
-        oy = y - self.offset_y
-
-        if ox < 0 or oy < 0:
-            return None
-
-        rx = int(ox / self.scale)
-        ry = int(oy / self.scale)
-
-        tx = rx - self.board_offset_x
-        ty = ry - self.board_offset_y
-        if tx < 0 or ty < 0:
+        tx = x - self.offset_x - round(BOARD_X * self.scale)
+        ty = y - self.offset_y - round(BOARD_Y * self.scale)
+        if tx < 0 or ty < 0 or not self.tile_size:
             return None
 
         col = tx // self.tile_size
@@ -139,51 +351,74 @@ class MineSweeperGUI:
         return None
 
     def _on_left_click(self, event):
-        if self.game.is_over:
+        self._play(event, MineSweeper.open)
+
+    def _on_right_click(self, event):
+        self._play(event, MineSweeper.mark)
+
+    def _play(self, event, action: Callable[..., OpenResult | MarkResult | None]):
+        """
+        落子提交到会话执行器后立即返回，不阻塞共用的 Tk 线程
+        """
+        if self._view is None or self._view.is_over:
             return
         pos = self._get_tile_position(event.x, event.y)
         if not pos:
             return
         row, col = pos
-        res = self.game.open(row, col)
-        self._update_display()
 
-        if res and self.game.is_over:
-            from tkinter import messagebox
-            messagebox.showinfo(
-                "游戏结束",
-                "恭喜你获得游戏胜利！"
-                if self.game.state == GameState.WIN
-                else "很遗憾，游戏失败",
-            )
+        def job(game: MineSweeper):
+            res = action(game, row, col)
+            return _View.of(game), res
 
-    def _on_right_click(self, event):
-        if self.game.is_over:
+        self._submit(job)
+
+    def _submit(self, job: Callable[[MineSweeper], Any]):
+        """
+        job 在事件循环中运行，返回 _View 或 (_View, 落子结果)
+        """
+        self.submit(job).add_done_callback(self._on_job_done)
+
+    def _on_job_done(self, future: Future):
+        # 由事件循环线程调用，结果与界面更新都投递回 Tk 线程
+        try:
+            outcome = future.result()
+        except asyncio.QueueFull:
+            self.host.post(self._show_busy)
             return
-        pos = self._get_tile_position(event.x, event.y)
-        if not pos:
+        if outcome is None:
+            # 游戏已结束并移除
             return
-        row, col = pos
-        self.game.mark(row, col)
-        self._update_display()
+        view, res = outcome if isinstance(outcome, tuple) else (outcome, None)
+        self.host.post(partial(self._show_result, view, res))
 
-        if self.game.state == GameState.WIN:
-            from tkinter import messagebox
-            messagebox.showinfo("游戏结束", "恭喜你获得游戏胜利！")
+    def _show_busy(self):
+        """会话收件箱已满，本次点击被丢弃"""
+        if not self.root.winfo_exists():
+            return
+        self.root.title(f"{TITLE}（操作过多，请稍后再试）")
+        self.root.after(BUSY_HINT_MS, self._reset_title)
 
-    # ================= Run =================
+    def _reset_title(self):
+        if self.root.winfo_exists():
+            self.root.title(TITLE)
 
-    def run(self):
-        try:
-            self.root.mainloop()
-        finally:
-            self.game.remove_listener(self._on_game_changed)
+    def _show_result(self, view: _View, res: OpenResult | MarkResult | None):
+        self._update_display(view)
+        if res is None or not view.is_over or not self.root.winfo_exists():
+            return
+
+        from tkinter import messagebox
+        messagebox.showinfo(
+            "游戏结束",
+            "恭喜你获得游戏胜利！"
+            if view.state == GameState.WIN
+            else "很遗憾，游戏失败",
+            parent=self.root,
+        )
+
+    # ================= Close =================
 
     def _on_close(self):
         self.game.remove_listener(self._on_game_changed)
         self.root.destroy()
-
-
-def start_gui(game: MineSweeper):
-    gui = MineSweeperGUI(game)
-    gui.run()
@@ -1,6 +1,6 @@
 
 from dataclasses import dataclass
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class GameState(Enum):
@@ -23,6 +23,37 @@ class MarkResult(Enum):
     WIN = 2
 
 
+class MoveOp(Enum):
+    OPEN = 0
+    MARK = 1
+
+
+class Quality(IntEnum):
+    # 原画质
+    FULL = 0
+    # 降低放大倍数
+    LOW_SCALE = 1
+    # 降低放大倍数 + 调色板 PNG
+    PALETTE = 2
+    # 文字棋盘
+    TEXT = 3
+    # 跳过中间帧，只发终局
+    SKIP = 4
+
+    @property
+    def label(self) -> str:
+        return _LABELS[self]
+
+
+_LABELS = {
+    Quality.FULL: "原画质",
+    Quality.LOW_SCALE: "低分辨率",
+    Quality.PALETTE: "低分辨率调色板",
+    Quality.TEXT: "文字棋盘",
+    Quality.SKIP: "跳过中间帧",
+}
+
+
 @dataclass
 class Tile:
     is_mine: bool = False
@@ -0,0 +1,133 @@
+# parser.py
+import re
+from dataclasses import dataclass, field
+
+from .model import GameSpec, MoveOp
+
+# 单次指令最多展开的格子数，防止 A1-Z99 之类的超大范围
+MAX_MOVES = 64
+
+# 行号最多两个字母（A..ZZ），棋盘行数不应超过此数
+MAX_ROWS = 26 * 27
+
+# 坐标：行用字母（A..Z, AA..ZZ），列用数字；A1-C5 为矩形范围，A* 为整行
+# 行号限制为两个字母，避免 "Windows10" 之类的普通聊天触发
+_ROW = r"[a-zA-Z]{1,2}"
+_CELL = rf"{_ROW}\d+"
+_TOKEN = rf"{_ROW}(?:\d+(?:-{_CELL})?|\*)"
+_SEP = r"[\s,，]*"
+
+# 供 filter.regex 使用的触发规则
+OPEN_PATTERN = rf"^\s*(?:{_TOKEN}{_SEP})+$"
+MARK_PATTERN = rf"^标雷{_SEP}(?:{_TOKEN}{_SEP})+$"
+
+_MARK_PREFIX = re.compile(r"\s*标雷")
+_TOKEN_RE = re.compile(
+    r"([a-z]{1,2})(?:(\d+)(?:-([a-z]{1,2})(\d+))?|(\*))", re.I
+)
+_SEP_RE = re.compile(_SEP)
+
+Move = tuple[MoveOp, int, int]
+
+
+@dataclass
+class MoveBatch:
+    op: MoveOp = MoveOp.OPEN
+    moves: list[Move] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def row_index(letters: str) -> int:
+    """
+    行字母转下标：A -> 0, Z -> 25, AA -> 26
+    """
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def row_label(index: int) -> str:
+    """
+    行下标转字母，row_index 的逆运算
+    """
+    label = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        label = chr(rem + 65) + label
+    return label
+
+
+def cell_label(row: int, col: int) -> str:
+    return f"{row_label(row)}{col + 1}"
+
+
+def parse_moves(text: str, spec: GameSpec, limit: int = MAX_MOVES) -> MoveBatch:
+    """
+    单次扫描解析落子指令，展开范围 / 整行，去重并按棋盘边界过滤
+    - "a1 b2-c3 d*"      -> 挖开
+    - "标雷 a1 b2"       -> 标记
+    """
+    pos = 0
+    op = MoveOp.OPEN
+    m = _MARK_PREFIX.match(text)
+    if m:
+        op = MoveOp.MARK
+        pos = m.end()
+
+    batch = MoveBatch(op)
+    seen: set[tuple[int, int]] = set()
+
+    def add(row: int, col: int) -> bool:
+        if (row, col) in seen:
+            return True
+        if len(batch.moves) >= limit:
+            batch.errors.append(f"单次最多操作 {limit} 格，其余已忽略")
+            return False
+        seen.add((row, col))
+        batch.moves.append((op, row, col))
+        return True
+
+    end = len(text)
+    while True:
+        pos = _SEP_RE.match(text, pos).end()  # type: ignore[union-attr]
+        if pos >= end:
+            break
+
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            batch.errors.append(f"无法识别 {text[pos:].split()[0]}")
+            break
+        pos = m.end()
+
+        row_a, col_a, row_b, col_b, whole_row = m.groups()
+        r1 = row_index(row_a)
+
+        if whole_row:
+            if r1 >= spec.rows:
+                batch.errors.append(f"{m.group(0)} 超出边界")
+                continue
+            r2, c1, c2 = r1, 0, spec.cols - 1
+        elif row_b is None:
+            r2, c1 = r1, int(col_a) - 1
+            c2 = c1
+        else:
+            r2 = row_index(row_b)
+            c1, c2 = int(col_a) - 1, int(col_b) - 1
+            r1, r2 = min(r1, r2), max(r1, r2)
+            c1, c2 = min(c1, c2), max(c1, c2)
+
+        # 范围裁剪到棋盘内，完全在外时报错
+        if r1 >= spec.rows or c1 >= spec.cols or c2 < 0:
+            batch.errors.append(f"{m.group(0)} 超出边界")
+            continue
+        r2, c1, c2 = min(r2, spec.rows - 1), max(c1, 0), min(c2, spec.cols - 1)
+
+        cells = (
+            (row, col) for row in range(r1, r2 + 1) for col in range(c1, c2 + 1)
+        )
+        if not all(add(row, col) for row, col in cells):
+            break
+
+    return batch
@@ -0,0 +1,115 @@
+# ratelimit.py
+"""
+出站限流：每个机器人账号一个令牌桶，发送与撤回各消耗一个令牌。
+每帧棋盘都为撤回上一帧预留令牌，余量越少，棋盘输出降级越多；
+令牌回升后逐级恢复原画质。
+"""
+
+import time
+from collections import Counter
+
+from astrbot.api import logger
+
+from .model import Quality
+
+# 各画质要求的最低余量比例（FULL, LOW_SCALE, PALETTE, TEXT），更低则为 SKIP
+# 余量 = 剩余令牌 - 待补撤回 - 一帧的开销
+_THRESHOLDS = (0.5, 0.3, 0.15, 0.0)
+# 一帧棋盘的开销：发送本帧 + 撤回上一帧
+PAIR_COST = 2
+# 回升时额外要求的余量，避免在阈值附近来回切换
+_HYSTERESIS = 0.1
+# 调用失败（多为被限流）时额外扣除的令牌
+_FAILURE_PENALTY = 2
+
+
+def _level_for(ratio: float, margin: float = 0.0) -> Quality:
+    for level, threshold in enumerate(_THRESHOLDS):
+        if ratio >= threshold + margin:
+            return Quality(level)
+    return Quality.SKIP
+
+
+class SendBudget:
+    """
+    单个机器人的发送预算：
+    - 每秒补充 rate 个令牌，容量 burst
+    - 余量不足一帧（发送 + 撤回）时跳过中间帧，把令牌留给撤回
+    - 发送总会扣令牌（可透支到 -burst），撤回在令牌不足时由调用方推迟
+    - counters 记录各画质的出图数与撤回 / 发送失败次数
+    rate 为 0 表示不限制，始终原画质
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.level = Quality.FULL
+        self.counters: Counter[str] = Counter()
+
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def quality(self, reserved: int = 0) -> Quality:
+        """
+        按余量比例决定当前画质，reserved 为已欠下（待补）的撤回数
+        """
+        if not self.rate:
+            return Quality.FULL
+
+        ratio = (self.tokens - reserved - PAIR_COST) / self.burst
+        level = _level_for(ratio)
+        if level < self.level:
+            level = min(self.level, _level_for(ratio, _HYSTERESIS))
+        if level != self.level:
+            trend = "降级" if level > self.level else "恢复"
+            logger.info(
+                f"[扫雷] {self.name} 发送预算余量 {ratio:.0%}，"
+                f"输出{trend}为「{level.label}」"
+            )
+            self.level = level
+        return level
+
+    def record(self, quality: Quality):
+        """登记一帧输出（含被跳过的帧）"""
+        self.counters[quality.name.lower()] += 1
+
+    def spend(self):
+        """发送：总会执行，令牌不足时透支"""
+        if self.rate:
+            self._refill()
+            self._tokens = max(self._tokens - 1, -self.burst)
+
+    def try_spend(self) -> bool:
+        """撤回：令牌不足时放弃"""
+        if not self.rate:
+            return True
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def wait_time(self) -> float:
+        """距离攒够一个令牌的秒数"""
+        if not self.rate:
+            return 0.0
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def fail(self, kind: str):
+        """调用失败计数，并按被限流处理多扣令牌"""
+        self.counters[f"{kind}_failed"] += 1
+        if self.rate:
+            self._tokens = max(self._tokens - _FAILURE_PENALTY, -self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled) * self.rate
+        )
+        self._refilled = now
@@ -5,11 +5,22 @@ from io import BytesIO
 
 from PIL import ImageDraw, ImageFont
 from PIL.Image import Image as IMG
-from PIL.Image import Resampling
+from PIL.Image import Quantize, Resampling
 
-from .model import GameSpec, GameState, Tile
+from .model import GameSpec, GameState, Quality, Tile
+from .parser import cell_label
 from .skin import Skin
 
+# 棋盘左上角在原始（未放大）背景中的位置，其上方为计数 / 笑脸栏
+BOARD_X = 12
+BOARD_Y = 55
+
+# 贴图标识：(Skin 字段名, 下标)
+SpriteKey = tuple[str, int]
+
+# 调色板 PNG 的颜色数（皮肤本身颜色很少，主要留给文字抗锯齿）
+PALETTE_COLORS = 64
+
 
 class MineSweeperRenderer:
     def __init__(
@@ -29,8 +40,10 @@ class MineSweeperRenderer:
         )
         # GUI
         self.tile_size = self.skin.numbers[0].width * self.scale
-        self.board_offset_x = int(12 * self.scale)
-        self.board_offset_y = int(55 * self.scale)
+        self.board_offset_x = int(BOARD_X * self.scale)
+        self.board_offset_y = int(BOARD_Y * self.scale)
+        # 放大倍数 -> (坐标字体, 小号字体)
+        self._fonts: dict[int, tuple[ImageFont.FreeTypeFont, ...]] = {}
 
     # ========= 对外唯一入口 =========
     def render(
@@ -39,27 +52,75 @@ class MineSweeperRenderer:
         tiles: list[list[Tile]],
         state: GameState,
         start_time: float,
+        origin: tuple[int, int] = (0, 0),
+        counter: int | None = None,
+        quality: Quality = Quality.FULL,
     ) -> bytes:
-
+        """
+        tiles 为视口内的格子，origin 为视口左上角的全局坐标（决定格子标签）
+        counter 为计数栏显示的数字，默认剩余雷数
+        quality 降级时减半放大倍数，并改用调色板 PNG
+        """
+        scale = self.scale
+        if quality >= Quality.LOW_SCALE:
+            scale = max(scale // 2, 1)
         bg = self.skin.background.copy()
 
         self._draw_face(bg, state)
-        self._draw_counts(bg, tiles)
+        self._draw_counts(bg, tiles, counter)
         self._draw_time(bg, start_time)
         self._draw_tiles(bg, tiles)
 
         bg = bg.resize(
-            (bg.width * self.scale, bg.height * self.scale),
+            (bg.width * scale, bg.height * scale),
             Resampling.NEAREST,
         )
 
-        self._draw_label(bg, tiles)
+        self._draw_label(bg, tiles, origin, scale)
+
+        if quality >= Quality.PALETTE:
+            bg = bg.quantize(PALETTE_COLORS, method=Quantize.FASTOCTREE)
 
         output = BytesIO()
         bg.save(output, format="PNG")
         output.seek(0)
         return output.getvalue()
 
+    # ========= GUI 直出（不编码） =========
+
+    def render_header(
+        self,
+        *,
+        tiles: list[list[Tile]],
+        state: GameState,
+        start_time: float,
+    ) -> IMG:
+        """
+        原始尺寸的顶栏（剩余雷数、笑脸、计时），GUI 自行缩放
+        """
+        bg = self.skin.background.crop((0, 0, self.skin.background.width, BOARD_Y))
+        self._draw_face(bg, state)
+        self._draw_counts(bg, tiles)
+        self._draw_time(bg, start_time)
+        return bg
+
+    def sprite(self, key: SpriteKey) -> IMG:
+        name, index = key
+        return getattr(self.skin, name)[index]
+
+    @staticmethod
+    def tile_sprite_key(t: Tile) -> SpriteKey:
+        """
+        格子当前应显示的贴图
+        """
+        if t.is_open:
+            if t.is_mine:
+                return ("icons", 5 if t.boom else 2)
+            if t.marked:
+                return ("icons", 4)
+            return ("numbers", t.count)
+        return ("icons", 3 if t.marked else 0)
+
     # ========= 基础工具 =========
 
     @staticmethod
@@ -84,10 +145,13 @@ class MineSweeperRenderer:
         y = 15
         bg.paste(face, (x, y))
 
-    def _draw_counts(self, bg: IMG, tiles: list[list[Tile]]):
-        marked = sum(1 for t in self._all_tiles(tiles) if t.marked)
-        mine_left = self.spec.mines - marked
-        nums = f"{mine_left:03d}"[:3]
+    def _draw_counts(
+        self, bg: IMG, tiles: list[list[Tile]], counter: int | None = None
+    ):
+        if counter is None:
+            marked = sum(1 for t in self._all_tiles(tiles) if t.marked)
+            counter = self.spec.mines - marked
+        nums = f"{counter:03d}"[:3]
 
         def digit_img(ch: str):
             return self.skin.digits[10 if ch == "-" else int(ch)]
@@ -111,31 +175,37 @@ class MineSweeperRenderer:
     def _draw_tiles(self, bg: IMG, tiles: list[list[Tile]]):
         for i in range(self.spec.rows):
             for j in range(self.spec.cols):
-                t = tiles[i][j]
-
-                if t.is_open:
-                    if t.is_mine:
-                        img = self.skin.icons[5 if t.boom else 2]
-                    else:
-                        if t.marked:
-                            img = self.skin.icons[4]
-                        else:
-                            img = self.skin.numbers[t.count]
-                else:
-                    img = self.skin.icons[3 if t.marked else 0]
-
-                x = 12 + img.width * j
-                y = 55 + img.height * i
+                img = self.sprite(self.tile_sprite_key(tiles[i][j]))
+                x = BOARD_X + img.width * j
+                y = BOARD_Y + img.height * i
                 bg.paste(img, (x, y))
 
-    def _draw_label(self, bg: IMG, tiles: list[list[Tile]]):
-
-
-        tile_w = self.skin.numbers[0].width * self.scale
-        tile_h = self.skin.numbers[0].height * self.scale
+    def _label_fonts(self, scale: int) -> tuple[ImageFont.FreeTypeFont, ...]:
+        fonts = self._fonts.get(scale)
+        if fonts is None:
+            font = (
+                self.font
+                if scale == self.scale
+                else self.font.font_variant(size=7 * scale)
+            )
+            fonts = self._fonts[scale] = (font, font.font_variant(size=5 * scale))
+        return fonts
+
+    def _draw_label(
+        self,
+        bg: IMG,
+        tiles: list[list[Tile]],
+        origin: tuple[int, int] = (0, 0),
+        scale: int | None = None,
+    ):
+        scale = scale or self.scale
+        row0, col0 = origin
+        normal_font, small_font = self._label_fonts(scale)
+        tile_w = self.skin.numbers[0].width * scale
+        tile_h = self.skin.numbers[0].height * scale
 
-        dx = 12.5 * self.scale
-        dy = 54.5 * self.scale
+        dx = 12.5 * scale
+        dy = 54.5 * scale
 
         draw = ImageDraw.Draw(bg)
 
@@ -145,10 +215,15 @@ class MineSweeperRenderer:
                 if t.is_open or t.marked:
                     continue
 
-                text = chr(i + 65) + str(j + 1)
-                _, _, w, h = self.font.getbbox(text)
+                text = cell_label(row0 + i, col0 + j)
+                font = normal_font
+                _, _, w, h = font.getbbox(text)
+                # 远处坐标（如 ZZ999）放不下时改用小号字体
+                if w > tile_w:
+                    font = small_font
+                    _, _, w, h = font.getbbox(text)
 
                 x = dx + tile_w * j + (tile_w - w) / 2
                 y = dy + tile_h * i + (tile_h - h) / 2
 
-                draw.text((x, y), text, font=self.font, fill="black")
+                draw.text((x, y), text, font=font, fill="black")
@@ -0,0 +1,376 @@
+# shard.py
+"""
+多进程分片托管：按 session_id 哈希把游戏固定到某个工作进程，
+由工作进程负责游戏状态与渲染，主进程只收发紧凑的请求 / 图片字节。
+工作进程崩溃后自动重启，并按移动日志重放恢复其上的全部游戏。
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .board import BoardMetrics
+from .model import GameSpec, GameState, MarkResult, MoveOp, OpenResult, Quality
+
+# ========= 协议 =========
+# 请求：(req_id, op, key, *args)   响应：(req_id, ok, payload)
+_CREATE = 0
+_PLAY = 1
+_DRAW = 2
+_STOP = 3
+_RESTORE = 4
+
+_PICKLE = pickle.HIGHEST_PROTOCOL
+
+
+class ShardCrashed(RuntimeError):
+    """工作进程在请求完成前退出"""
+
+
+# ========= 工作进程 =========
+
+
+def _worker_main(conn, skins_dir: str, font_path: str, cache_dir: str | None):
+    """工作进程入口（仅依赖 core 内的纯逻辑 / 渲染模块）"""
+    from .game import MineSweeper
+    from .renderer import MineSweeperRenderer
+    from .skin import SkinManager
+
+    skin_mgr = SkinManager(Path(skins_dir), Path(cache_dir) if cache_dir else None)
+    games: dict[str, MineSweeper] = {}
+
+    def create(key, rows, cols, mines, skin_name, seed, start_time):
+        spec = GameSpec(rows, cols, mines)
+        renderer = MineSweeperRenderer(
+            spec=spec,
+            skin=skin_mgr.load(skin_name, spec),
+            font_path=font_path,
+        )
+        game = MineSweeper(spec, renderer, seed=seed, skin_name=skin_name)
+        game.start_time = start_time
+        games[key] = game
+        return game
+
+    def play(game, op, moves):
+        results = game.play(MoveOp(op), moves)
+        return [r.value if r is not None else None for r in results]
+
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            break
+
+        req_id, op, key, *args = pickle.loads(data)
+        try:
+            if op == _CREATE:
+                payload = create(key, *args).draw()
+            elif op == _PLAY:
+                move_op, moves, render, quality = args
+                game = games[key]
+                results = play(game, move_op, moves)
+                metrics = game.metrics
+                payload = (
+                    results,
+                    game.state.value,
+                    game.draw(Quality(quality)) if render else None,
+                    (metrics.bbbv, metrics.openings, metrics.isolated)
+                    if metrics
+                    else None,
+                )
+            elif op == _DRAW:
+                payload = games[key].draw(Quality(*args))
+            elif op == _STOP:
+                games.pop(key, None)
+                payload = None
+            elif op == _RESTORE:
+                create_args, log = args
+                game = create(key, *create_args)
+                for move_op, moves in log:
+                    play(game, move_op, moves)
+                payload = game.state.value
+            else:
+                raise ValueError(f"未知请求 {op}")
+            reply = (req_id, True, payload)
+        except Exception as e:
+            reply = (req_id, False, repr(e))
+
+        conn.send_bytes(pickle.dumps(reply, _PICKLE))
+
+
+# ========= 主进程 =========
+
+
+@dataclass
+class _Shard:
+    index: int
+    process: Any = None
+    conn: Any = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    pending: dict[int, asyncio.Future] = field(default_factory=dict)
+
+
+@dataclass
+class _GameLog:
+    """重放所需的建局参数与已确认的移动"""
+
+    create_args: tuple
+    moves: list[tuple[int, list[tuple[int, int]]]] = field(default_factory=list)
+
+
+class ShardPool:
+    """
+    工作进程池：
+    - 会话按 crc32(session_id) 固定到分片
+    - 每个分片一条双工管道，后台线程读取响应并回到事件循环
+    - 工作进程崩溃时失败其未完成请求，重启后按移动日志恢复游戏
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        skins_dir: Path,
+        font_path: Path,
+        cache_dir: Path | None = None,
+    ):
+        self._worker_args = (
+            str(skins_dir),
+            str(font_path),
+            str(cache_dir) if cache_dir else None,
+        )
+        self._ctx = multiprocessing.get_context("spawn")
+        self._shards = [_Shard(i) for i in range(workers)]
+        self._logs: dict[str, _GameLog] = {}
+        self._ids = itertools.count(1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing = False
+
+    def shard_of(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % len(self._shards)
+
+    # ========= 生命周期 =========
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        for shard in self._shards:
+            await asyncio.to_thread(self._spawn, shard)
+            shard.ready.set()
+
+    def _spawn(self, shard: _Shard):
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child, *self._worker_args),
+            name=f"minesweeper-shard-{shard.index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        shard.process, shard.conn = process, parent
+        threading.Thread(
+            target=self._read_loop,
+            args=(shard, parent),
+            name=f"minesweeper-shard-reader-{shard.index}",
+            daemon=True,
+        ).start()
+
+    async def close(self):
+        # 结束工作进程即可，读取线程随管道 EOF 自行退出
+        self._closing = True
+        for shard in self._shards:
+            if shard.process:
+                shard.process.terminate()
+                await asyncio.to_thread(shard.process.join, 2)
+                if shard.process.is_alive():
+                    shard.process.kill()
+
+    # ========= 收发 =========
+
+    def _read_loop(self, shard: _Shard, conn):
+        """后台线程：读取响应，交回事件循环处理"""
+        loop = self._loop
+        assert loop is not None
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                conn.close()
+                if not self._closing and not loop.is_closed():
+                    loop.call_soon_threadsafe(self._on_crash, shard, conn)
+                return
+            loop.call_soon_threadsafe(self._resolve, shard, *pickle.loads(data))
+
+    def _resolve(self, shard: _Shard, req_id: int, ok: bool, payload: Any):
+        future = shard.pending.pop(req_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _send(self, shard: _Shard, op: int, key: str, *args) -> asyncio.Future:
+        assert self._loop is not None
+        req_id = next(self._ids)
+        future = self._loop.create_future()
+        shard.pending[req_id] = future
+        try:
+            shard.conn.send_bytes(pickle.dumps((req_id, op, key, *args), _PICKLE))
+        except (OSError, ValueError) as e:
+            shard.pending.pop(req_id, None)
+            future.set_exception(ShardCrashed(str(e)))
+        return future
+
+    async def _call(self, op: int, key: str, *args) -> Any:
+        shard = self._shards[self.shard_of(key)]
+        await shard.ready.wait()
+        return await self._send(shard, op, key, *args)
+
+    # ========= 崩溃恢复 =========
+
+    def _on_crash(self, shard: _Shard, conn):
+        if self._closing or conn is not shard.conn:
+            return
+        shard.ready.clear()
+        for future in shard.pending.values():
+            if not future.done():
+                future.set_exception(ShardCrashed(f"分片 {shard.index} 已退出"))
+        shard.pending.clear()
+        asyncio.create_task(self._recover(shard))
+
+    async def _recover(self, shard: _Shard):
+        await asyncio.to_thread(self._spawn, shard)
+        keys = [k for k in self._logs if self.shard_of(k) == shard.index]
+        futures = [
+            self._send(
+                shard, _RESTORE, k, self._logs[k].create_args, self._logs[k].moves
+            )
+            for k in keys
+        ]
+        await asyncio.gather(*futures, return_exceptions=True)
+        shard.ready.set()
+
+    # ========= 对外接口 =========
+
+    async def create(
+        self, key: str, spec: GameSpec, skin_name: str, seed: int, start_time: float
+    ) -> bytes:
+        create_args = (spec.rows, spec.cols, spec.mines, skin_name, seed, start_time)
+        self._logs[key] = _GameLog(create_args)
+        return await self._call(_CREATE, key, *create_args)
+
+    async def play(
+        self,
+        key: str,
+        op: MoveOp,
+        moves: list[tuple[int, int]],
+        render: bool,
+        quality: Quality = Quality.FULL,
+    ) -> tuple[
+        list[int | None], int, bytes | None, tuple[int, int, int] | None
+    ]:
+        payload = await self._call(
+            _PLAY, key, op.value, moves, render, quality.value
+        )
+        # 仅记录已确认的移动，重放结果与崩溃前一致
+        if key in self._logs:
+            self._logs[key].moves.append((op.value, moves))
+        return payload
+
+    async def draw(self, key: str, quality: Quality = Quality.FULL) -> bytes:
+        return await self._call(_DRAW, key, quality.value)
+
+    def stop(self, key: str):
+        self._logs.pop(key, None)
+        shard = self._shards[self.shard_of(key)]
+        if shard.ready.is_set():
+            self._send(shard, _STOP, key).add_done_callback(_ignore_result)
+
+
+def _ignore_result(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
+
+class RemoteGame:
+    """
+    托管在工作进程中的游戏在主进程的代理，
+    只镜像规格与状态，落子和渲染都通过 ShardPool 完成
+    """
+
+    def __init__(
+        self,
+        pool: ShardPool,
+        key: str,
+        spec: GameSpec,
+        skin_name: str,
+        seed: int,
+    ):
+        self.pool = pool
+        self.key = key
+        self.spec = spec
+        self.skin_name = skin_name
+        self.seed = seed
+        self.start_time = time.time()
+        self.state = GameState.PREPARE
+        # 每日挑战只在主进程托管
+        self.daily = 0
+        self.clicks = 0
+        # 布雷后由工作进程随落子结果带回
+        self.metrics: BoardMetrics | None = None
+
+    @property
+    def is_win(self) -> bool:
+        return self.state == GameState.WIN
+
+    @property
+    def is_fail(self) -> bool:
+        return self.state == GameState.FAIL
+
+    @property
+    def is_over(self) -> bool:
+        return self.is_win or self.is_fail
+
+    def add_listener(self, cb: Callable[[], None]):
+        # 状态在工作进程中，无本地变更通知
+        pass
+
+    def memory_footprint(self) -> int:
+        return 0
+
+    async def start(self) -> bytes:
+        return await self.pool.create(
+            self.key, self.spec, self.skin_name, self.seed, self.start_time
+        )
+
+    async def play(
+        self,
+        op: MoveOp,
+        moves: list[tuple[int, int]],
+        render: bool = True,
+        quality: Quality = Quality.FULL,
+    ) -> tuple[list[OpenResult | MarkResult | None], bytes | None]:
+        values, state, image, metrics = await self.pool.play(
+            self.key, op, moves, render, quality
+        )
+        self.state = GameState(state)
+        if metrics:
+            self.metrics = BoardMetrics(*metrics)
+        result_type = OpenResult if op == MoveOp.OPEN else MarkResult
+        results = [result_type(v) if v is not None else None for v in values]
+        self.clicks += len(results) - results.count(result_type.OUT)
+        return results, image
+
+    async def draw(self, quality: Quality = Quality.FULL) -> bytes:
+        return await self.pool.draw(self.key, quality)
+
+    def close(self):
+        self.pool.stop(self.key)
@@ -1,5 +1,11 @@
+import asyncio
+import hashlib
+import mmap
+import os
 import random
+import struct
 from dataclasses import dataclass
+from io import BytesIO
 from pathlib import Path
 
 from PIL import Image
@@ -7,6 +13,39 @@ from PIL.Image import Image as IMG
 
 from .model import GameSpec
 
+# 编译皮肤文件格式：
+# MAGIC | 版本(u16) | 源文件 mtime_ns(i64) | 源文件大小(u64) | 源文件 SHA1 | 各精灵 RGBA
+# 精灵按 SPRITE_BOXES 的顺序依次存放，尺寸由切图坐标决定
+# 源文件的修改时间与大小不变时直接使用；变了才计算哈希比对
+# 切图坐标变更时需同步提升 SKIN_VERSION
+SKIN_MAGIC = b"MSKN"
+SKIN_VERSION = 2
+_HEADER = struct.Struct("<4sHqQ20s")
+
+# 精灵切图坐标 (left, top, right, bottom)
+SPRITE_BOXES: dict[str, list[tuple[int, int, int, int]]] = {
+    "numbers": [(i * 16, 0, i * 16 + 16, 16) for i in range(9)],
+    "icons": [(i * 16, 16, i * 16 + 16, 32) for i in range(8)],
+    "digits": [(i * 12, 33, i * 12 + 11, 54) for i in range(11)],
+    "faces": [(i * 27, 55, i * 27 + 26, 81) for i in range(5)],
+    "frame": [
+        (0, 82, 12, 93),
+        (13, 82, 14, 93),
+        (15, 82, 27, 93),
+        (0, 94, 12, 95),
+        (15, 94, 27, 95),
+        (0, 96, 12, 107),
+        (13, 96, 14, 107),
+        (15, 96, 27, 107),
+        (0, 108, 12, 109),
+        (15, 108, 27, 109),
+        (0, 110, 12, 121),
+        (13, 110, 14, 121),
+        (15, 110, 27, 121),
+        (28, 82, 69, 107),
+    ],
+}
+
 
 @dataclass
 class Skin:
@@ -18,16 +57,22 @@ class Skin:
 
 
 class SkinManager:
-    def __init__(self, skins_dir: Path):
+    def __init__(self, skins_dir: Path, cache_dir: Path | None = None):
         self.skins_dir = skins_dir
+        # 编译皮肤缓存目录，为空时不落盘
+        self.cache_dir = cache_dir
 
         self._skin_names = []
         self._skin_cache: dict[tuple[str, int, int], Skin] = {}
+        # skin_name -> 切好的精灵图
+        self._sprite_cache: dict[str, dict[str, list[IMG]]] = {}
 
     async def initialize(self):
         """初始化"""
         names = self._scan_skins()
         self._skin_names.extend(names)
+        # 后台预热精灵图，首局游戏无需再解码 BMP
+        await asyncio.to_thread(self.compile_all)
 
     def _scan_skins(self) -> list[str]:
         """皮肤发现"""
@@ -64,46 +109,159 @@ class SkinManager:
         self._skin_cache[key] = skin
         return skin
 
+    def compile_all(self):
+        """预编译全部皮肤"""
+        for name in self._skin_names:
+            self._load_sprites(name)
+
     def _load_skin_impl(self, skin_name: str, spec: GameSpec) -> Skin:
-        image = Image.open(self.skins_dir / f"{skin_name}.bmp").convert("RGBA")
+        sprites = self._load_sprites(skin_name)
+        background = self._build_background(sprites["frame"], spec)
+
+        return Skin(
+            sprites["numbers"],
+            sprites["icons"],
+            sprites["digits"],
+            sprites["faces"],
+            background,
+        )
+
+    # ========= 精灵图 =========
+
+    def _load_sprites(self, skin_name: str) -> dict[str, list[IMG]]:
+        """精灵图加载：内存 -> 编译缓存 -> BMP"""
+        if skin_name in self._sprite_cache:
+            return self._sprite_cache[skin_name]
+
+        src = self.skins_dir / f"{skin_name}.bmp"
+        stat = src.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        sprites = self._read_compiled(skin_name, src, stamp)
+        if sprites is None:
+            data = src.read_bytes()
+            image = Image.open(BytesIO(data)).convert("RGBA")
+            sprites = {
+                group: [image.crop(box) for box in boxes]
+                for group, boxes in SPRITE_BOXES.items()
+            }
+            digest = hashlib.sha1(data).digest()
+            self._write_compiled(skin_name, stamp, digest, sprites)
+
+        self._sprite_cache[skin_name] = sprites
+        return sprites
+
+    def _compiled_path(self, skin_name: str) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{skin_name}.skin"
+
+    def _read_compiled(
+        self, skin_name: str, src: Path, stamp: tuple[int, int]
+    ) -> dict[str, list[IMG]] | None:
+        """
+        读取编译皮肤：源文件 (mtime, 大小) 一致时直接使用，
+        不一致时比对源文件哈希，哈希仍一致则刷新记录的 (mtime, 大小)，否则返回 None
+        """
+        path = self._compiled_path(skin_name)
+        if path is None or not path.exists():
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                try:
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError):
+                    buf = f.read()
+                try:
+                    magic, version, *cached_stamp, digest = _HEADER.unpack_from(buf, 0)
+                    if magic != SKIN_MAGIC or version != SKIN_VERSION:
+                        return None
+                    fresh = tuple(cached_stamp) == stamp
+                    if not fresh and hashlib.sha1(src.read_bytes()).digest() != digest:
+                        return None
+                    sprites = self._decode_compiled(buf)
+                finally:
+                    if isinstance(buf, mmap.mmap):
+                        buf.close()
+        except Exception:
+            # 文件损坏，回退到 BMP
+            return None
+
+        if sprites is not None and not fresh:
+            # 源文件只是被 touch / 重新拷贝过，内容未变
+            self._write_compiled(skin_name, stamp, digest, sprites)
+        return sprites
+
+    @staticmethod
+    def _decode_compiled(buf) -> dict[str, list[IMG]] | None:
+        """按切图坐标依次取出已切好的精灵，长度不符时返回 None"""
+        offset = _HEADER.size
+        sprites = {}
+        for group, boxes in SPRITE_BOXES.items():
+            images = []
+            for left, top, right, bottom in boxes:
+                size = (right - left, bottom - top)
+                end = offset + size[0] * size[1] * 4
+                images.append(Image.frombytes("RGBA", size, buf[offset:end]))
+                offset = end
+            sprites[group] = images
+        return sprites if offset == len(buf) else None
 
-        def cut(box):
-            return image.crop(box)
+    def _write_compiled(
+        self,
+        skin_name: str,
+        stamp: tuple[int, int],
+        digest: bytes,
+        sprites: dict[str, list[IMG]],
+    ):
+        """原子写入编译皮肤"""
+        path = self._compiled_path(skin_name)
+        if path is None:
+            return
 
-        numbers = [cut((i * 16, 0, i * 16 + 16, 16)) for i in range(9)]
-        icons = [cut((i * 16, 16, i * 16 + 16, 32)) for i in range(8)]
-        digits = [cut((i * 12, 33, i * 12 + 11, 54)) for i in range(11)]
-        faces = [cut((i * 27, 55, i * 27 + 26, 81)) for i in range(5)]
+        header = _HEADER.pack(SKIN_MAGIC, SKIN_VERSION, *stamp, digest)
+        payload = header + b"".join(
+            image.tobytes() for group in SPRITE_BOXES for image in sprites[group]
+        )
 
-        background = self._build_background(image, spec)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, path)
+        except OSError:
+            # 缓存写入失败不影响游戏
+            pass
 
-        return Skin(numbers, icons, digits, faces, background)
+    # ========= 背景 =========
 
-    def _build_background(self, image: Image.Image, spec: GameSpec) -> Image.Image:
+    def _build_background(self, frame: list[IMG], spec: GameSpec) -> IMG:
         """背景拼接"""
         w, h = spec.cols, spec.rows
         background = Image.new("RGBA", (w * 16 + 24, h * 16 + 66), "silver")
 
-        blocks = [
-            ((0, 82, 12, 93), (0, 0, 12, 11)),
-            ((13, 82, 14, 93), (12, 0, 12 + w * 16, 11)),
-            ((15, 82, 27, 93), (12 + w * 16, 0, 24 + w * 16, 11)),
-            ((0, 94, 12, 95), (0, 11, 12, 44)),
-            ((15, 94, 27, 95), (12 + w * 16, 11, 24 + w * 16, 44)),
-            ((0, 96, 12, 107), (0, 44, 12, 55)),
-            ((13, 96, 14, 107), (12, 44, 12 + w * 16, 55)),
-            ((15, 96, 27, 107), (12 + w * 16, 44, 24 + w * 16, 55)),
-            ((0, 108, 12, 109), (0, 55, 12, 55 + h * 16)),
-            ((15, 108, 27, 109), (12 + w * 16, 55, 24 + w * 16, 55 + h * 16)),
-            ((0, 110, 12, 121), (0, 55 + h * 16, 12, 66 + h * 16)),
-            ((13, 110, 14, 121), (12, 55 + h * 16, 12 + w * 16, 66 + h * 16)),
-            ((15, 110, 27, 121), (12 + w * 16, 55 + h * 16, 24 + w * 16, 66 + h * 16)),
-            ((28, 82, 69, 107), (16, 15, 57, 40)),
-            ((28, 82, 69, 107), (w * 16 - 33, 15, 8 + w * 16, 40)),
+        dsts = [
+            (0, 0, 12, 11),
+            (12, 0, 12 + w * 16, 11),
+            (12 + w * 16, 0, 24 + w * 16, 11),
+            (0, 11, 12, 44),
+            (12 + w * 16, 11, 24 + w * 16, 44),
+            (0, 44, 12, 55),
+            (12, 44, 12 + w * 16, 55),
+            (12 + w * 16, 44, 24 + w * 16, 55),
+            (0, 55, 12, 55 + h * 16),
+            (12 + w * 16, 55, 24 + w * 16, 55 + h * 16),
+            (0, 55 + h * 16, 12, 66 + h * 16),
+            (12, 55 + h * 16, 12 + w * 16, 66 + h * 16),
+            (12 + w * 16, 55 + h * 16, 24 + w * 16, 66 + h * 16),
+            (16, 15, 57, 40),
+            (w * 16 - 33, 15, 8 + w * 16, 40),
         ]
+        # 两个计数器底板共用同一块切图
+        parts = [*frame, frame[-1]]
 
-        for src, dst in blocks:
-            part = image.crop(src).resize((dst[2] - dst[0], dst[3] - dst[1]))
-            background.paste(part, dst)
+        for part, dst in zip(parts, dsts):
+            background.paste(part.resize((dst[2] - dst[0], dst[3] - dst[1])), dst)
 
         return background
@@ -0,0 +1,191 @@
+# snapshot.py
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .board import BoardLayout, bits
+from .model import GameSpec, GameState
+
+if TYPE_CHECKING:
+    from .game import MineSweeper
+
+# 快照格式：头部 | 皮肤名 | 会话来源 | 棋盘（每格 4bit，两格一字节）
+SNAPSHOT_MAGIC = b"MSGS"
+SNAPSHOT_VERSION = 3
+# magic, version, rows, cols, mines, seed, state, start_time, 皮肤名长度, 来源长度
+_HEADER_V1 = struct.Struct("<4sBHHHIBdHH")
+# v2 追加：每日挑战日期（YYYYMMDD，普通对局为 0）
+_HEADER_V2 = struct.Struct("<4sBHHHIBdHHI")
+# v3 追加：点击数
+_HEADER = struct.Struct("<4sBHHHIBdHHII")
+_HEADERS = {1: _HEADER_V1, 2: _HEADER_V2, SNAPSHOT_VERSION: _HEADER}
+
+_MINE = 1
+_OPEN = 2
+_MARKED = 4
+_BOOM = 8
+
+
+@dataclass(frozen=True, slots=True)
+class GameSnapshot:
+    spec: GameSpec
+    seed: int
+    state: GameState
+    start_time: float
+    skin_name: str
+    origin: str
+    # 每格一个 4bit 标志，按行展开
+    flags: bytes
+    daily: int = 0
+    clicks: int = 0
+
+
+def encode_snapshot(game: "MineSweeper", origin: str = "") -> bytes:
+    """
+    将游戏状态编码为紧凑二进制
+    """
+    n = game.spec.rows * game.spec.cols
+    mines = bits(game.layout.mines if game.layout else 0, n)
+    opened = bits(game.opened, n)
+    flagged = bits(game.flagged, n)
+    flags = bytearray(
+        (_MINE if mines[i] == "1" else 0)
+        | (_OPEN if opened[i] == "1" else 0)
+        | (_MARKED if flagged[i] == "1" else 0)
+        | (_BOOM if i == game.boom else 0)
+        for i in range(n)
+    )
+    if len(flags) % 2:
+        flags.append(0)
+    packed = bytes(lo | (hi << 4) for lo, hi in zip(flags[::2], flags[1::2]))
+
+    skin = game.skin_name.encode()
+    src = origin.encode()
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        game.spec.rows,
+        game.spec.cols,
+        game.spec.mines,
+        game.seed,
+        game.state.value,
+        game.start_time,
+        len(skin),
+        len(src),
+        game.daily,
+        game.clicks,
+    )
+    return header + skin + src + packed
+
+
+def decode_snapshot(data: bytes) -> GameSnapshot:
+    """
+    解码快照，格式不符时抛出 ValueError
+    """
+    magic, version = struct.unpack_from("<4sB", data, 0)
+    header = _HEADERS.get(version)
+    if magic != SNAPSHOT_MAGIC or header is None:
+        raise ValueError("不支持的快照格式")
+
+    _, _, rows, cols, mines, seed, state, start_time, skin_len, src_len, *rest = (
+        header.unpack_from(data, 0)
+    )
+    # 旧版本缺少的字段取默认值
+    daily, clicks = (*rest, 0, 0)[:2]
+
+    pos = header.size
+    skin_name = data[pos : pos + skin_len].decode()
+    pos += skin_len
+    origin = data[pos : pos + src_len].decode()
+    pos += src_len
+
+    flags = bytearray()
+    for b in data[pos:]:
+        flags.append(b & 0x0F)
+        flags.append(b >> 4)
+    if len(flags) < rows * cols:
+        raise ValueError("快照数据不完整")
+
+    return GameSnapshot(
+        spec=GameSpec(rows, cols, mines),
+        seed=seed,
+        state=GameState(state),
+        start_time=start_time,
+        skin_name=skin_name,
+        origin=origin,
+        flags=bytes(flags[: rows * cols]),
+        daily=daily,
+        clicks=clicks,
+    )
+
+
+def apply_snapshot(game: "MineSweeper", snap: GameSnapshot):
+    """
+    把快照中的棋盘写回游戏实例（已带共享布局的对局只恢复位集）
+    """
+    mines = opened = flagged = 0
+    for i, f in enumerate(snap.flags):
+        if f & _MINE:
+            mines |= 1 << i
+        if f & _OPEN:
+            opened |= 1 << i
+        if f & _MARKED:
+            flagged |= 1 << i
+        if f & _BOOM:
+            game.boom = i
+
+    game.opened = opened
+    game.flagged = flagged
+    game.state = snap.state
+    game.start_time = snap.start_time
+    game.daily = snap.daily
+    game.clicks = snap.clicks
+    if game.layout is None and snap.state != GameState.PREPARE:
+        game.layout = BoardLayout.from_mines(snap.spec, mines)
+
+
+class SnapshotStore:
+    """
+    快照文件存储（同步接口，由调用方放到线程中批量执行）
+    """
+
+    SUFFIX = ".snap"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        # 会话 ID 可能含有非法文件名字符，使用十六进制编码
+        return self.root / f"{key.encode().hex()}{self.SUFFIX}"
+
+    def read(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write_batch(self, items: dict[str, bytes | None]):
+        """
+        批量写入，值为 None 表示删除
+        """
+        for key, data in items.items():
+            path = self._path(key)
+            if data is None:
+                path.unlink(missing_ok=True)
+                continue
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+    def read_all(self) -> dict[str, bytes]:
+        result = {}
+        for path in self.root.glob(f"*{self.SUFFIX}"):
+            try:
+                key = bytes.fromhex(path.stem).decode()
+            except ValueError:
+                continue
+            result[key] = path.read_bytes()
+        return result
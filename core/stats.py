@@ -0,0 +1,321 @@
+# stats.py
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from .model import GameSpec
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id          INTEGER PRIMARY KEY,
+    player_id   TEXT    NOT NULL,
+    rows        INTEGER NOT NULL,
+    cols        INTEGER NOT NULL,
+    mines       INTEGER NOT NULL,
+    won         INTEGER NOT NULL,
+    duration    REAL    NOT NULL,
+    finished_at REAL    NOT NULL,
+    bbbv        INTEGER NOT NULL DEFAULT 0,
+    clicks      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS players (
+    player_id TEXT    NOT NULL,
+    rows      INTEGER NOT NULL,
+    cols      INTEGER NOT NULL,
+    mines     INTEGER NOT NULL,
+    name      TEXT    NOT NULL,
+    played    INTEGER NOT NULL,
+    won       INTEGER NOT NULL,
+    best      REAL,
+    best_speed REAL,
+    PRIMARY KEY (player_id, rows, cols, mines)
+);
+"""
+
+# 旧库缺少的列：(表, 列, 定义)
+_MIGRATIONS = [
+    ("games", "bbbv", "INTEGER NOT NULL DEFAULT 0"),
+    ("games", "clicks", "INTEGER NOT NULL DEFAULT 0"),
+    ("players", "best_speed", "REAL"),
+]
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_players_best ON players (rows, cols, mines, best);
+CREATE INDEX IF NOT EXISTS idx_players_speed
+    ON players (rows, cols, mines, best_speed);
+"""
+
+_UPSERT_PLAYER = """
+INSERT INTO players (
+    player_id, rows, cols, mines, name, played, won, best, best_speed
+)
+VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT (player_id, rows, cols, mines) DO UPDATE SET
+    name   = excluded.name,
+    played = played + 1,
+    won    = won + excluded.won,
+    best   = CASE
+        WHEN excluded.best IS NULL THEN best
+        WHEN best IS NULL OR excluded.best < best THEN excluded.best
+        ELSE best
+    END,
+    best_speed = CASE
+        WHEN excluded.best_speed IS NULL THEN best_speed
+        WHEN best_speed IS NULL OR excluded.best_speed > best_speed
+            THEN excluded.best_speed
+        ELSE best_speed
+    END
+"""
+
+# 排行方式：最佳用时（越短越好）/ 最佳 3BV/s（越高越好，不同棋盘之间可比）
+RANK_TIME = "time"
+RANK_SPEED = "speed"
+
+
+@dataclass(frozen=True, slots=True)
+class GameRecord:
+    player_id: str
+    player_name: str
+    spec: GameSpec
+    won: bool
+    duration: float
+    finished_at: float
+    # 棋盘 3BV 与本局点击数，未知时为 0
+    bbbv: int = 0
+    clicks: int = 0
+
+    @property
+    def speed(self) -> float | None:
+        """通关的 3BV/s，未通关或缺少 3BV 时为 None"""
+        if not self.won or not self.bbbv or self.duration <= 0:
+            return None
+        return self.bbbv / self.duration
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerStats:
+    player_id: str
+    name: str
+    played: int
+    won: int
+    best: float | None
+    best_speed: float | None = None
+
+    @property
+    def win_rate(self) -> float:
+        return self.won / self.played if self.played else 0.0
+
+    def score(self, order: str) -> float | None:
+        return self.best_speed if order == RANK_SPEED else self.best
+
+
+def _better(order: str, a: float, b: float) -> bool:
+    """a 是否优于 b"""
+    return a > b if order == RANK_SPEED else a < b
+
+
+class StatsStore:
+    """
+    战绩存储（SQLite）：
+    - record 只写内存队列，由后台 flush 在线程中按批次单事务落盘
+    - 每个难度、每种排行方式缓存一份前 N 名，新战绩到来时就地更新；
+      无法就地更新时作废缓存，下次查询先落盘再按索引重查
+    """
+
+    def __init__(self, path: Path, top_n: int = 10):
+        self.path = path
+        self.top_n = top_n
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+
+        self._pending: list[GameRecord] = []
+        self._flush_lock = asyncio.Lock()
+        # (spec, 排行方式) -> 前 N 名
+        self._rankings: dict[tuple[GameSpec, str], list[PlayerStats]] = {}
+
+    # ========= 数据库（在线程中执行） =========
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            conn.executescript(_INDEXES)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        for table, column, decl in _MIGRATIONS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def _write_batch(self, batch: list[GameRecord]):
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO games (player_id, rows, cols, mines, won, duration,"
+                    " finished_at, bbbv, clicks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            r.player_id,
+                            r.spec.rows,
+                            r.spec.cols,
+                            r.spec.mines,
+                            int(r.won),
+                            r.duration,
+                            r.finished_at,
+                            r.bbbv,
+                            r.clicks,
+                        )
+                        for r in batch
+                    ],
+                )
+                conn.executemany(
+                    _UPSERT_PLAYER,
+                    [
+                        (
+                            r.player_id,
+                            r.spec.rows,
+                            r.spec.cols,
+                            r.spec.mines,
+                            r.player_name,
+                            int(r.won),
+                            r.duration if r.won else None,
+                            r.speed,
+                        )
+                        for r in batch
+                    ],
+                )
+
+    def _query_top(self, spec: GameSpec, order: str) -> list[PlayerStats]:
+        column, direction = (
+            ("best_speed", "DESC") if order == RANK_SPEED else ("best", "ASC")
+        )
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT player_id, name, played, won, best, best_speed FROM players"
+                f" WHERE rows = ? AND cols = ? AND mines = ? AND {column} IS NOT NULL"
+                f" ORDER BY {column} {direction} LIMIT ?",
+                (spec.rows, spec.cols, spec.mines, self.top_n),
+            )
+            return [PlayerStats(*row) for row in rows]
+
+    def _query_player(self, player_id: str, spec: GameSpec) -> PlayerStats | None:
+        with self._db_lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT player_id, name, played, won, best, best_speed"
+                    " FROM players"
+                    " WHERE player_id = ? AND rows = ? AND cols = ? AND mines = ?",
+                    (player_id, spec.rows, spec.cols, spec.mines),
+                )
+                .fetchone()
+            )
+            return PlayerStats(*row) if row else None
+
+    def _close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ========= 写入 =========
+
+    def record(self, rec: GameRecord):
+        """
+        登记一局结束的游戏（不阻塞，等待 flush 落盘）
+        """
+        self._pending.append(rec)
+        self._update_ranking(rec)
+
+    def _update_ranking(self, rec: GameRecord, orders=(RANK_TIME, RANK_SPEED)):
+        duration = rec.duration if rec.won else None
+        speed = rec.speed
+        for order in orders:
+            key = (rec.spec, order)
+            ranking = self._rankings.get(key)
+            if ranking is None:
+                continue
+
+            for i, entry in enumerate(ranking):
+                if entry.player_id != rec.player_id:
+                    continue
+                best, best_speed = entry.best, entry.best_speed
+                if duration is not None and (best is None or duration < best):
+                    best = duration
+                if speed is not None and (best_speed is None or speed > best_speed):
+                    best_speed = speed
+                ranking[i] = replace(
+                    entry,
+                    name=rec.player_name,
+                    played=entry.played + 1,
+                    won=entry.won + rec.won,
+                    best=best,
+                    best_speed=best_speed,
+                )
+                sign = -1 if order == RANK_SPEED else 1
+                ranking.sort(key=lambda e: sign * (e.score(order) or 0.0))
+                break
+            else:
+                # 榜外玩家的新纪录可能进榜，但其累计战绩只在库中，作废缓存
+                new = speed if order == RANK_SPEED else duration
+                last = ranking[-1].score(order) if len(ranking) >= self.top_n else None
+                if new is not None and (last is None or _better(order, new, last)):
+                    del self._rankings[key]
+
+    async def flush(self):
+        """
+        批量写入排队中的战绩
+        """
+        async with self._flush_lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+        except Exception:
+            # 写入失败时放回队列，下次重试
+            self._pending[:0] = batch
+            raise
+
+    async def close(self):
+        await self.flush()
+        await asyncio.to_thread(self._close)
+
+    # ========= 查询 =========
+
+    async def top(self, spec: GameSpec, order: str = RANK_TIME) -> list[PlayerStats]:
+        """
+        前 N 名（优先读缓存），order 为 RANK_TIME 或 RANK_SPEED
+        """
+        key = (spec, order)
+        ranking = self._rankings.get(key)
+        if ranking is None:
+            # 持锁查询，期间新到的战绩一定还在队列中、未入库
+            async with self._flush_lock:
+                await self._flush_locked()
+                ranking = await asyncio.to_thread(self._query_top, spec, order)
+                self._rankings[key] = ranking
+                for rec in self._pending:
+                    if rec.spec == spec:
+                        self._update_ranking(rec, (order,))
+        return list(self._rankings.get(key, ranking))
+
+    async def player(self, player_id: str, spec: GameSpec) -> PlayerStats | None:
+        """
+        单个玩家在某难度下的战绩
+        """
+        await self.flush()
+        return await asyncio.to_thread(self._query_player, player_id, spec)
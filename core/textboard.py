@@ -0,0 +1,45 @@
+# textboard.py
+"""
+文字棋盘：发送预算紧张时代替图片输出。
+全部使用全角字符，等宽显示时行列对齐。
+"""
+
+from .model import Tile
+from .parser import row_label
+
+_DIGITS = "０１２３４５６７８９"
+_SPACE = "　"
+
+
+def _full_width(text: str) -> str:
+    """ASCII 字母数字转全角"""
+    return "".join(chr(ord(ch) + 0xFEE0) for ch in text)
+
+
+def _cell(t: Tile) -> str:
+    if t.is_open:
+        if t.is_mine:
+            return "爆" if t.boom else "雷"
+        if t.marked:
+            return "错"
+        return _DIGITS[t.count] if t.count else "□"
+    return "旗" if t.marked else "■"
+
+
+def render_text(tiles: list[list[Tile]], origin: tuple[int, int] = (0, 0)) -> str:
+    """
+    首行为列号个位，每行以行号开头；origin 为左上角的全局坐标
+    """
+    if not tiles:
+        return ""
+    row0, col0 = origin
+    width = len(row_label(row0 + len(tiles) - 1))
+
+    header = _SPACE * width + "".join(
+        _DIGITS[(col0 + j + 1) % 10] for j in range(len(tiles[0]))
+    )
+    lines = [header]
+    for i, row in enumerate(tiles):
+        label = _full_width(row_label(row0 + i)).rjust(width, _SPACE)
+        lines.append(label + "".join(_cell(t) for t in row))
+    return "\n".join(lines)
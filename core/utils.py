@@ -1,8 +1,8 @@
 
 
 
+import asyncio
 import os
-import re
 import sys
 
 from astrbot.api import logger
@@ -35,16 +35,17 @@ def detect_desktop() -> bool:
         return False
 
 
-def parse_position(pos: str) -> tuple[int, int] | None:
+_desktop_probe: asyncio.Task[bool] | None = None
+
+
+def probe_desktop() -> asyncio.Task[bool]:
     """
-    将 A1 / b12 解析为 (x, y)
+    在后台线程探测桌面环境，结果全局缓存（只探测一次）
     """
-    m = re.match(r"^([a-z])(\d+)$", pos, re.I)
-    if not m:
-        return None
-    x = ord(m.group(1).lower()) - ord("a")
-    y = int(m.group(2)) - 1
-    return x, y
+    global _desktop_probe
+    if _desktop_probe is None:
+        _desktop_probe = asyncio.create_task(asyncio.to_thread(detect_desktop))
+    return _desktop_probe
 
 
 async def set_group_ban(event: AiocqhttpMessageEvent, ban_time: int):
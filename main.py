@@ -1,11 +1,15 @@
 import asyncio
-import re
+import importlib
+import random
 import shutil
-import threading
+import time
+from dataclasses import replace
+from functools import cached_property, partial
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from astrbot.api import logger
-from astrbot.api.event import filter
+from astrbot.api.event import MessageChain, filter
 from astrbot.api.star import Context, Star
 from astrbot.core import AstrBotConfig
 from astrbot.core.message.components import Image, Plain
@@ -15,15 +19,34 @@ from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
 )
 from astrbot.core.star.star_tools import StarTools
 
+from .core.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    RenderProfile,
+    estimate_cost,
+    validate_spec,
+)
+from .core.daily import DailyBoard, DailyChallenge
+from .core.endless import EndlessGame
 from .core.game import GameManager, MineSweeper
-from .core.model import GameSpec, MarkResult, OpenResult
-from .core.renderer import MineSweeperRenderer
-from .core.skin import SkinManager
-from .core.utils import detect_desktop, parse_position, set_group_ban
+from .core.model import GameSpec, MarkResult, MoveOp, OpenResult, Quality
+from .core.parser import MARK_PATTERN, OPEN_PATTERN, Move, cell_label, parse_moves
+from .core.shard import RemoteGame, ShardCrashed, ShardPool
+from .core.snapshot import GameSnapshot, SnapshotStore, apply_snapshot
+from .core.stats import RANK_SPEED, RANK_TIME, GameRecord, StatsStore
+from .core.utils import probe_desktop, set_group_ban
 from .sender import MessageSender
 
+if TYPE_CHECKING:
+    from .core.gui import GuiHost
+    from .core.renderer import MineSweeperRenderer
+    from .core.skin import SkinManager
+
 
 class MinesweeperPlugin(Star):
+    # 快照批量写入间隔（秒）
+    SNAPSHOT_INTERVAL = 5
+
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.config = config
@@ -33,54 +56,273 @@ class MinesweeperPlugin(Star):
         if len(self.level_keys) == 0:
             raise ValueError("没有配置扫雷难度")
         self.default_preset = self.level_preset[self.level_keys[0]]
+        self.endless_view = self._parse_endless_view(config)
 
         self.data_dir = StarTools.get_data_dir()
         self.cache_dir = self.data_dir / "cache"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
 
         self.skins_dir = Path(__file__).parent / "skins"
-        self.skin_mgr = SkinManager(self.skins_dir)
 
         self.font_path = Path(__file__).parent / "font.ttf"
 
-        self.game_mgr = GameManager()
+        # 分片模式：游戏状态与渲染托管到工作进程
+        workers = int(config.get("shard_workers", 0))
+        self.shard_pool = (
+            ShardPool(
+                workers, self.skins_dir, self.font_path, self.data_dir / "skin_cache"
+            )
+            if workers > 0
+            else None
+        )
+
+        self.admission = AdmissionController(
+            max_games=int(config.get("max_games", 0)),
+            max_games_per_group=int(config.get("max_games_per_group", 0)),
+            max_memory_mb=float(config.get("max_memory_mb", 0)),
+            render_budget=float(config.get("render_budget", 0)),
+            wait=float(config.get("admission_wait", 10)),
+        )
+        # 预热后按实测渲染耗时校准
+        self.render_profile = RenderProfile()
+
+        self.idle_ttl = max(int(config.get("idle_timeout", 30)), 1) * 60
+        hibernate_after = max(int(config.get("hibernate_after", 5)), 1) * 60
+        self.game_mgr = GameManager(
+            idle_ttl=self.idle_ttl,
+            hibernate_after=hibernate_after,
+            store=SnapshotStore(self.data_dir / "snapshots"),
+            factory=self._restore_game,
+            on_stop=self.admission.release,
+            on_restore=self._readmit,
+        )
+        self.daily = DailyChallenge()
+        self.stats = StatsStore(
+            self.data_dir / "stats.db", top_n=int(config.get("ranking_size", 10))
+        )
         self._cleanup_task: asyncio.Task | None = None
-        self.sender = MessageSender(config)
+        self.sender = MessageSender(config, self.cache_dir, id_ttl=self.idle_ttl)
 
         self.loop: asyncio.AbstractEventLoop | None = None
+        self._warmup_task: asyncio.Task | None = None
 
     async def initialize(self):
         """插件加载时"""
         self.loop = asyncio.get_running_loop()
+        self.game_mgr.loop = self.loop
+        if self.shard_pool:
+            await self.shard_pool.start()
+        # 重模块导入与皮肤预热放到后台，不阻塞插件加载
+        self._warmup_task = asyncio.create_task(self._warm_up())
+        if self.config["use_gui"]:
+            probe_desktop()
+        restored = await self.game_mgr.restore_all()
+        self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+        logger.info(f"[扫雷] 插件已加载，恢复 {restored} 局游戏")
+
+    async def _warm_up(self):
+        """后台导入渲染模块并预热皮肤"""
+        start = time.perf_counter()
+        for name in (".core.skin", ".core.renderer"):
+            await asyncio.to_thread(importlib.import_module, name, __package__)
         await self.skin_mgr.initialize()
-        logger.info("[扫雷] 插件已加载")
+        if self.skin_mgr.skin_list:
+            await asyncio.to_thread(self._calibrate_render)
+        cost = (time.perf_counter() - start) * 1000
+        logger.debug(f"[扫雷] 预热完成，耗时 {cost:.1f}ms")
+
+    def _calibrate_render(self):
+        """实测一帧默认难度的渲染耗时，校准开局准入的渲染估算"""
+        spec = self.default_preset
+        game = self._create_game(spec, self.skin_mgr.get_skin_by_index(0))
+        renderer = game.renderer
+        start = time.perf_counter()
+        game.draw()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.render_profile = RenderProfile.calibrate(
+            spec, renderer.skin.numbers[0].width, renderer.scale, elapsed
+        )
+        logger.debug(
+            f"[扫雷] 渲染校准：{spec.rows}x{spec.cols} 单帧 {elapsed:.1f}ms，"
+            f"系数 {self.render_profile.factor:.2f}"
+        )
+
+    async def _ensure_ready(self):
+        """等待后台预热完成"""
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self._warm_up())
+        await asyncio.shield(self._warmup_task)
+
+    async def _cleanup_loop(self):
+        """
+        后台清理：
+        - 清理闲置超时的游戏与过期的消息记录
+        - 休眠闲置的游戏，批量写入快照
+        """
+        while True:
+            now = time.time()
+            evicted = self.game_mgr.evict_expired(now)
+            if evicted:
+                reclaimed = sum(self._game_memory(g) for _, _, g in evicted if g)
+                logger.info(
+                    f"[扫雷] 清理 {len(evicted)} 局闲置游戏，"
+                    f"估计释放 {reclaimed / 1024:.1f}KB"
+                )
+                for _, origin, _ in evicted:
+                    await self._notify_evicted(origin)
+            self.sender.evict_expired(now)
+            self.game_mgr.hibernate_idle(now)
+
+            try:
+                await self.game_mgr.flush()
+            except OSError as e:
+                logger.warning(f"[扫雷] 快照写入失败：{e}")
+            try:
+                await self.stats.flush()
+            except Exception as e:
+                logger.warning(f"[扫雷] 战绩写入失败：{e}")
+
+            deadlines = [
+                d
+                for d in (self.game_mgr.next_deadline(), self.sender.next_deadline())
+                if d is not None
+            ]
+            delay = min(deadlines, default=now + 60) - time.time()
+            # 快照最多延迟 SNAPSHOT_INTERVAL 秒落盘
+            await asyncio.sleep(min(max(delay, 1), self.SNAPSHOT_INTERVAL))
+
+    def _game_memory(self, game: MineSweeper | RemoteGame | EndlessGame) -> int:
+        """
+        单局常驻内存估算（位集、布局、背景图、渲染器与字体句柄），
+        与开局准入使用同一估算；无尽模式另加已触及分块的位集
+        """
+        if isinstance(game, EndlessGame):
+            cost = estimate_cost(game.view, self.render_profile)
+            return cost.memory + game.memory_footprint()
+        return estimate_cost(game.spec, self.render_profile).memory
+
+    def _reply(self, event: AstrMessageEvent, text: str):
+        """文字回复由平台直接发出，同样计入发送预算"""
+        self.sender.charge(event)
+        return event.plain_result(text)
+
+    async def _notify_evicted(self, origin: str):
+        if not origin:
+            return
+        minutes = self.idle_ttl // 60
+        chain = MessageChain().message(f"扫雷游戏超过 {minutes} 分钟无操作，已自动结束")
+        try:
+            await self.context.send_message(origin, chain)
+        except Exception as e:
+            logger.warning(f"[扫雷] 超时通知发送失败：{e}")
+
+    @cached_property
+    def skin_mgr(self) -> "SkinManager":
+        from .core.skin import SkinManager
+
+        return SkinManager(self.skins_dir, self.data_dir / "skin_cache")
+
+    @cached_property
+    def gui_host(self) -> "GuiHost":
+        from .core.gui import GuiHost
+
+        return GuiHost()
 
     async def terminate(self):
         """插件卸载时"""
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+        await self.sender.close()
+        # 保存全部进行中的游戏，重载后恢复
+        self.game_mgr.persist_all()
+        await self.game_mgr.flush()
+        self.game_mgr.shutdown()
+        try:
+            await self.stats.close()
+        except Exception as e:
+            logger.warning(f"[扫雷] 战绩写入失败：{e}")
+        if self.shard_pool:
+            await self.shard_pool.close()
+        if "gui_host" in self.__dict__:
+            await asyncio.to_thread(self.gui_host.close)
         # 重新创建缓存目录
         if self.cache_dir.exists():
             shutil.rmtree(self.cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         logger.info("[扫雷] 插件已卸载")
 
+    def _create_renderer(
+        self, spec: GameSpec, skin_name: str
+    ) -> "MineSweeperRenderer":
+        from .core.renderer import MineSweeperRenderer
+
+        return MineSweeperRenderer(
+            spec=spec,
+            skin=self.skin_mgr.load(skin_name, spec),
+            font_path=str(self.font_path),
+        )
+
+    def _create_game(
+        self,
+        spec: GameSpec,
+        skin_name: str,
+        seed: int | None = None,
+        daily: DailyBoard | None = None,
+    ) -> MineSweeper:
+        renderer = self._create_renderer(spec, skin_name)
+        if daily is None:
+            return MineSweeper(spec, renderer, seed=seed, skin_name=skin_name)
+
+        # 每日挑战：共享只读布局，本局只持有挖开 / 标记位集
+        game = MineSweeper(spec, renderer, skin_name=skin_name, layout=daily.layout)
+        game.opened = daily.start
+        game.daily = daily.day
+        return game
+
+    def _restore_game(self, snap: GameSnapshot) -> MineSweeper:
+        """从快照重建游戏（休眠唤醒 / 重载恢复）"""
+        daily = self.daily.board(snap.spec, snap.daily) if snap.daily else None
+        game = self._create_game(snap.spec, snap.skin_name, seed=snap.seed, daily=daily)
+        apply_snapshot(game, snap)
+        return game
+
+    def _readmit(self, key: str, snap: GameSnapshot):
+        """
+        重载恢复的游戏登记到准入控制，使全局局数与内存计数包含它们
+        群聊会话的 session_id 即群号，与开局时的分组一致
+        """
+        self.admission.register(key, key, estimate_cost(snap.spec, self.render_profile))
+
     def _parse_difficulty_level(self, conf: dict) -> dict[str, GameSpec]:
+        """解析难度预设，格式错误或超出渲染预算的预设跳过"""
         result = {}
+        max_frame_ms = float(conf.get("max_frame_ms", 0))
 
         for item in conf.get("difficulty_level", []):
-            name, rows, cols, nums = item.split()
-            result[name] = GameSpec(int(rows), int(cols), int(nums))
+            try:
+                name, rows, cols, nums = item.split()
+                spec = GameSpec(int(rows), int(cols), int(nums))
+            except ValueError:
+                logger.warning(f"[扫雷] 难度预设格式错误，已跳过：{item}")
+                continue
+            reason = validate_spec(spec, max_frame_ms)
+            if reason:
+                logger.warning(f"[扫雷] 难度预设 {name} 不可用：{reason}")
+                continue
+            result[name] = spec
 
         return result
 
-    def _save_img_bytes(self, event: AstrMessageEvent, img_bytes: bytes) -> str:
-        """把图片 bytes 落盘，返回绝对路径"""
-        sid = event.session_id
-        uid = event.get_sender_id()
-        fname = f"{sid}_{uid}.png"
-        fpath = self.cache_dir / fname
-        fpath.write_bytes(img_bytes)
-        return str(fpath.absolute())
-
+    def _parse_endless_view(self, conf: dict) -> GameSpec:
+        """解析无尽模式的视口大小（行数 列数），格式错误时使用默认值"""
+        try:
+            rows, cols = map(int, str(conf.get("endless_view", "12 16")).split())
+            if rows < 1 or cols < 1:
+                raise ValueError
+        except ValueError:
+            logger.warning("[扫雷] 无尽模式视口格式错误，已使用默认值 12 16")
+            rows, cols = 12, 16
+        return GameSpec(rows, cols, 0)
 
     @filter.command("扫雷", alias={"开始扫雷"})
     async def start_minesweeper(
@@ -88,55 +330,82 @@ class MinesweeperPlugin(Star):
         event: AstrMessageEvent,
         level: str = "",
         skin_index: int | None = None,
+    ):
+        async for result in self._start_game(event, level, skin_index):
+            yield result
+
+    @filter.command("每日扫雷", alias={"每日挑战"})
+    async def start_daily_minesweeper(
+        self,
+        event: AstrMessageEvent,
+        level: str = "",
+        skin_index: int | None = None,
+    ):
+        async for result in self._start_game(event, level, skin_index, daily=True):
+            yield result
+
+    @filter.command("无尽扫雷")
+    async def start_endless_minesweeper(
+        self,
+        event: AstrMessageEvent,
+        skin_index: int | None = None,
+    ):
+        async for result in self._start_game(event, "", skin_index, endless=True):
+            yield result
+
+    async def _start_game(
+        self,
+        event: AstrMessageEvent,
+        level: str,
+        skin_index: int | None,
+        daily: bool = False,
+        endless: bool = False,
     ):
         sid = event.session_id
 
         if self.game_mgr.is_running(sid):
-            yield event.plain_result("你已经在进行扫雷游戏了")
+            yield self._reply(event, "你已经在进行扫雷游戏了")
             return
 
-        spec = self.level_preset.get(level, self.default_preset)
+        spec = (
+            self.endless_view
+            if endless
+            else self.level_preset.get(level, self.default_preset)
+        )
         if level and level not in self.level_preset:
-            yield event.plain_result(f"难度仅支持：{list(self.level_preset.keys())}")
+            yield self._reply(event, f"难度仅支持：{list(self.level_preset.keys())}")
             return
 
-        skin_name = (
-            self.skin_mgr.get_skin_by_index(skin_index - 1)
-            if skin_index
-            else self.config["default_skin"]
-        )
-        skin = self.skin_mgr.load(skin_name, spec)
-
-        renderer = MineSweeperRenderer(
-            spec=spec,
-            skin=skin,
-            font_path=str(self.font_path),
-        )
-
-        game = MineSweeper(spec, renderer)
-        self.game_mgr.create(sid, game)
+        # 每日挑战的首帧共享，不计渲染开销
+        cost = estimate_cost(spec, self.render_profile)
+        if daily:
+            cost = replace(cost, render_ms=0)
+        group = event.get_group_id() or sid
+        try:
+            if not self.admission.try_admit(sid, group, cost):
+                yield self._reply(event, "当前开局人数较多，正在排队…")
+                await self.admission.admit(sid, group, cost)
+        except AdmissionRejected as e:
+            yield self._reply(event, str(e))
+            return
 
-        def send_board():
-            img_bytes = game.draw()
-            img_path = self._save_img_bytes(event, img_bytes)
-            asyncio.run_coroutine_threadsafe(
-                self.sender.send_img_replace_last(event, img_path), self.loop # type: ignore
+        try:
+            title, img = await self._create_session(
+                event, level or self.level_keys[0], skin_index, daily, endless
             )
+        except BaseException:
+            if not self.game_mgr.is_running(sid):
+                self.admission.release(sid)
+            raise
 
-        game.on_send_board(send_board)
-
-        if self.config["use_gui"] and detect_desktop():
-            from .core.gui import start_gui
-            threading.Thread(
-                target=start_gui,
-                args=(game,),
-                daemon=True,
-            ).start()
+        if self.config.get("coop_mode", False):
+            title += "（合作模式：群内所有人共同操作同一棋盘）"
 
+        self.sender.charge(event, Quality.FULL)
         yield event.chain_result(
             [
-                Plain("扫雷游戏开始！"),
-                Image.fromBytes(game.draw()),
+                Plain(title),
+                Image.fromBytes(img),
                 Plain(
                     "a1b2c3 —— 挖开格子\n"
                     "标雷 c4 —— 标记地雷\n"
@@ -146,91 +415,354 @@ class MinesweeperPlugin(Star):
             ]
         )
 
+    async def _create_session(
+        self,
+        event: AstrMessageEvent,
+        level: str,
+        skin_index: int | None,
+        daily: bool,
+        endless: bool = False,
+    ) -> tuple[str, bytes]:
+        """建局并渲染首帧，返回 (标题, 图片)"""
+        await self._ensure_ready()
+
+        skin_name = (
+            self.skin_mgr.get_skin_by_index(skin_index - 1)
+            if skin_index
+            else self.config["default_skin"]
+        )
+        if endless:
+            # 无尽模式在主进程按需生成分块，不进分片
+            img = await self._start_endless_game(event, skin_name)
+            return "无尽扫雷开始！棋盘向右下不断延伸，踩雷前挖开的格子数即得分", img
+
+        spec = self.level_preset[level]
+        board = self.daily.board(spec) if daily else None
+        if board:
+            # 每日挑战的布局在主进程共享，不进分片
+            img = await self._start_local_game(event, spec, skin_name, board)
+            title = f"每日挑战 {board.label}（{level}）开始！"
+        elif self.shard_pool:
+            img = await self._start_remote_game(event, spec, skin_name)
+            title = "扫雷游戏开始！"
+        else:
+            img = await self._start_local_game(event, spec, skin_name)
+            title = "扫雷游戏开始！"
+
+        return title, img
+
+    async def _start_local_game(
+        self,
+        event: AstrMessageEvent,
+        spec: GameSpec,
+        skin_name: str,
+        daily: DailyBoard | None = None,
+    ) -> bytes:
+        sid = event.session_id
+        game = self._create_game(spec, skin_name, daily=daily)
+        frame = None
+        if daily:
+            # 同一天同一皮肤的首帧只渲染一次，其余会话的开局回复直接复用
+            # （计时已定格在首次渲染时，之后的棋盘都重新渲染）
+            frame = await self.daily.frame(
+                daily, skin_name, partial(self.game_mgr.render, game)
+            )
+
+        use_gui = self.config["use_gui"] and await probe_desktop()
+        self.game_mgr.create(sid, game, event.unified_msg_origin, pinned=use_gui)
+
+        def send_board():
+            self.game_mgr.submit_threadsafe(sid, partial(self._send_board_job, event))
+
+        game.on_send_board(send_board)
+
+        if use_gui:
+            self.gui_host.open(game, partial(self.game_mgr.submit_threadsafe, sid))
+
+        if frame is not None:
+            return frame
+        return await self.game_mgr.submit(sid, self.game_mgr.render)
+
+    async def _start_endless_game(
+        self, event: AstrMessageEvent, skin_name: str
+    ) -> bytes:
+        """无尽模式：只渲染玩家位置周围的视口（不支持 GUI 与休眠）"""
+        sid = event.session_id
+        game = EndlessGame(
+            self.endless_view,
+            self._create_renderer(self.endless_view, skin_name),
+            density=float(self.config.get("endless_density", 0.18)),
+            skin_name=skin_name,
+        )
+        self.game_mgr.create(sid, game, event.unified_msg_origin)
+        return await self.game_mgr.submit(sid, self.game_mgr.render)
+
+    async def _start_remote_game(
+        self, event: AstrMessageEvent, spec: GameSpec, skin_name: str
+    ) -> bytes:
+        """分片模式：在工作进程中建局（不支持 GUI）"""
+        assert self.shard_pool is not None
+        sid = event.session_id
+        game = RemoteGame(
+            self.shard_pool, sid, spec, skin_name, seed=random.getrandbits(32)
+        )
+        self.game_mgr.create(sid, game, event.unified_msg_origin)
+        return await self.game_mgr.submit(sid, lambda g: g.start())
+
     @filter.command("结束扫雷")
     async def stop_minesweeper(self, event: AstrMessageEvent):
         if not self.game_mgr.is_running(event.session_id):
-            yield event.plain_result("当前没有进行中的扫雷游戏")
+            yield self._reply(event, "当前没有进行中的扫雷游戏")
             return
+        game = self.game_mgr.games.get(event.session_id)
         self.game_mgr.stop(event.session_id)
-        yield event.plain_result("已结束扫雷游戏")
+        if isinstance(game, EndlessGame):
+            yield self._reply(event, f"已结束无尽扫雷，本局得分 {game.score}")
+            return
+        yield self._reply(event, "已结束扫雷游戏")
 
     @filter.regex(r"^雷盘$")
     async def show_minesweeper(self, event: AstrMessageEvent):
-        game = self.game_mgr.get(event.session_id)
-        if not game:
+        if not self.game_mgr.is_running(event.session_id):
             return
 
-        yield event.chain_result([Image.fromBytes(game.draw())])
+        # 主动查看总会出图，发送预算不足时最多降到调色板
+        quality = min(self.sender.quality(event), Quality.PALETTE)
+        try:
+            img = await self.game_mgr.submit(
+                event.session_id, partial(self.game_mgr.render, quality=quality)
+            )
+        except asyncio.QueueFull:
+            yield self._reply(event, "操作太频繁，请稍后再试")
+            return
+        except ShardCrashed:
+            yield self._reply(event, "扫雷服务正在恢复，请稍后重试")
+            return
+        if img:
+            self.sender.charge(event, quality)
+            yield event.chain_result([Image.fromBytes(img)])
 
-    @filter.regex(r"^([a-zA-Z][0-9]+)(\s*[a-zA-Z][0-9]+)*$")
-    async def open_minesweeper(self, event: AstrMessageEvent):
-        game = self.game_mgr.get(event.session_id)
-        if not game:
+    @filter.command("扫雷排行")
+    async def show_ranking(
+        self, event: AstrMessageEvent, level: str = "", order: str = ""
+    ):
+        if level and level not in self.level_preset:
+            yield self._reply(event, f"难度仅支持：{list(self.level_preset.keys())}")
             return
+        level = level or self.level_keys[0]
+        spec = self.level_preset[level]
+        # 用时受棋盘难易影响，3BV/s 按棋盘实际难度折算后更可比
+        order = RANK_SPEED if order.lower() in ("3bv", "3bv/s", "速度") else RANK_TIME
+
+        ranking = await self.stats.top(spec, order)
+        if order == RANK_SPEED:
+            lines = [f"【{level}】3BV/s 排行"]
+        else:
+            lines = [f"【{level}】最快通关排行"]
+        if not ranking:
+            lines.append("暂无通关记录")
+        for i, p in enumerate(ranking, 1):
+            score = (
+                f"{p.best_speed:.2f} 3BV/s"
+                if order == RANK_SPEED
+                else f"{p.best:.1f} 秒"
+            )
+            lines.append(
+                f"{i}. {p.name}  {score}（胜率 {p.win_rate:.0%}，{p.played} 局）"
+            )
 
-        positions = re.findall(r"[a-zA-Z][0-9]+", event.message_str)
-        msgs = []
+        mine = await self.stats.player(event.get_sender_id(), spec)
+        if mine:
+            best = f"，最佳 {mine.best:.1f} 秒" if mine.best is not None else ""
+            if mine.best_speed is not None:
+                best += f"，最高 {mine.best_speed:.2f} 3BV/s"
+            lines.append(
+                f"你的战绩：{mine.played} 局胜 {mine.won} 局"
+                f"（{mine.win_rate:.0%}）{best}"
+            )
+        yield self._reply(event, "\n".join(lines))
 
-        for pos in positions:
-            xy = parse_position(pos)
-            if not xy:
-                msgs.append(f"位置 {pos} 不合法")
-                continue
+    @filter.regex(OPEN_PATTERN)
+    async def open_minesweeper(self, event: AstrMessageEvent):
+        async for result in self._handle_moves(event):
+            yield result
 
-            res = game.open(*xy)
+    @filter.regex(MARK_PATTERN)
+    async def mark_minesweeper(self, event: AstrMessageEvent):
+        async for result in self._handle_moves(event):
+            yield result
 
-            if res == OpenResult.OUT:
-                msgs.append(f"{pos} 超出边界")
-            elif res == OpenResult.FAIL:
-                msgs.append("很遗憾，游戏失败")
-            elif res == OpenResult.WIN:
-                msgs.append("恭喜你获得游戏胜利！")
+    async def _handle_moves(self, event: AstrMessageEvent):
+        """解析落子指令（在进入执行器之前完成校验），再交给会话执行器"""
+        game = self.game_mgr.get(event.session_id)
+        if not game:
+            return
 
-            if game.is_over:
-                self.game_mgr.stop(event.session_id)
-                break
+        batch = parse_moves(event.message_str, game.spec)
+        if isinstance(game, EndlessGame):
+            # 无尽棋盘几乎任何坐标都在界内，只接受当前视口内的格子，
+            # 否则 "ps5"、"cs2" 之类的聊天也会被当成落子
+            outside = [m for m in batch.moves if not game.in_view(m[1], m[2])]
+            if outside:
+                batch.moves = [m for m in batch.moves if game.in_view(m[1], m[2])]
+                _, row, col = outside[0]
+                batch.errors.append(
+                    f"{cell_label(row, col)} 等 {len(outside)} 格不在当前视野内"
+                )
+        if not batch.moves:
+            # 无前缀的坐标可能只是普通聊天（如 "ok1"），没有一格在棋盘内时不回复
+            if batch.errors and batch.op == MoveOp.MARK:
+                yield self._reply(event, "\n".join(batch.errors))
+            return
 
+        try:
+            result = await self.game_mgr.submit(
+                event.session_id, partial(self._move_job, event, batch.moves)
+            )
+        except asyncio.QueueFull:
+            yield self._reply(event, "操作太频繁，请稍后再试")
+            return
+        except ShardCrashed:
+            yield self._reply(event, "扫雷服务正在恢复，请稍后重试")
+            return
+        if result is None:
+            return
+
+        msgs, failed, delivery = result
+        msgs = batch.errors + msgs
         if msgs:
-            yield event.plain_result("\n".join(msgs))
+            yield self._reply(event, "\n".join(msgs))
 
-        img_path = self._save_img_bytes(event, game.draw())
-        await self.sender.send_img_replace_last(event, img_path)
+        if delivery:
+            await delivery
 
         if (
-            game.is_fail
+            failed
             and isinstance(event, AiocqhttpMessageEvent)
             and self.config["ban_time"] > 0
         ):
             await set_group_ban(event, ban_time=self.config["ban_time"])
 
-    @filter.regex(r"^标雷(\s*[a-zA-Z][0-9]+)+$")
-    async def mark_minesweeper(self, event: AstrMessageEvent):
-        game = self.game_mgr.get(event.session_id)
-        if not game:
-            return
-
-        positions = re.findall(r"[a-zA-Z][0-9]+", event.message_str)
-        msgs = []
-
-        for pos in positions:
-            xy = parse_position(pos)
-            if not xy:
-                msgs.append(f"{pos} 不合法")
-                continue
+    # ========= 会话执行器任务 =========
 
-            res = game.mark(*xy)
+    async def _move_job(
+        self,
+        event: AstrMessageEvent,
+        moves: list[Move],
+        game: MineSweeper | RemoteGame | EndlessGame,
+    ) -> tuple[list[str], bool, asyncio.Future | None]:
+        """
+        落子并渲染，棋盘按顺序进入发送队列
+        合作模式下若后面还有排队的落子，本步不渲染，由最后一步统一出图
+        发送预算不足时逐级降级：低分辨率 -> 调色板 -> 文字棋盘 -> 跳过中间帧
+        """
+        sid = event.session_id
+        coop = self.config.get("coop_mode", False)
+        wanted = not coop or self.game_mgr.pending(sid) == 0
+        quality = self.sender.quality(event)
+        if quality == Quality.TEXT and isinstance(game, RemoteGame):
+            # 分片中的游戏没有文字棋盘，仍出调色板图
+            quality = Quality.PALETTE
+        render = wanted and quality < Quality.TEXT
+
+        op = moves[0][0]
+        cells = [(row, col) for _, row, col in moves]
+        try:
+            results, img = await self.game_mgr.apply(
+                game, op, cells, render=render, quality=quality
+            )
+            if img is None and game.is_over and quality < Quality.SKIP:
+                # 终局图尽量以图片发送；余量连一帧都不够时同样跳过，胜负由文字回复告知
+                quality = min(quality, Quality.PALETTE)
+                img = await self.game_mgr.render(game, quality)
+        except Exception:
+            if coop and wanted:
+                # 前面排队的落子把出图留给了本步，本步失败时补发当前棋盘
+                await self._resend_board(event, game, quality)
+            raise
+
+        player = event.get_sender_name() or event.get_sender_id()
+        if coop:
+            self.game_mgr.record_moves(sid, player, len(results))
 
-            if res == MarkResult.OUT:
-                msgs.append(f"{pos} 超出边界")
-            elif res == MarkResult.OPENED:
-                msgs.append(f"{pos} 已挖开，不能标记")
-            elif res == MarkResult.WIN:
+        msgs = []
+        for (row, col), res in zip(cells, results):
+            if res == OpenResult.FAIL:
+                msgs.append(
+                    f"很遗憾，{player} 踩到了地雷，游戏失败"
+                    if coop
+                    else "很遗憾，游戏失败"
+                )
+            elif res in (OpenResult.WIN, MarkResult.WIN):
                 msgs.append("恭喜你获得游戏胜利！")
-                self.game_mgr.stop(event.session_id)
-                break
-
-        if msgs:
-            yield event.plain_result("\n".join(msgs))
+            elif res == MarkResult.OPENED:
+                msgs.append(f"{cell_label(row, col)} 已挖开，不能标记")
+
+        if game.is_over:
+            now = time.time()
+            if isinstance(game, EndlessGame):
+                msgs.append(
+                    f"本局得分 {game.score}，用时 {now - game.start_time:.1f} 秒"
+                )
+            elif game.daily:
+                # 每日棋盘人人相同，不计入常规排行
+                if game.is_win:
+                    msgs.append(f"今日挑战用时 {now - game.start_time:.1f} 秒")
+            else:
+                metrics = game.metrics
+                rec = GameRecord(
+                    player_id=event.get_sender_id(),
+                    player_name=player,
+                    spec=game.spec,
+                    won=game.is_win,
+                    duration=now - game.start_time,
+                    finished_at=now,
+                    bbbv=metrics.bbbv if metrics else 0,
+                    clicks=game.clicks,
+                )
+                self.stats.record(rec)
+                if rec.speed is not None and rec.clicks:
+                    msgs.append(
+                        f"用时 {rec.duration:.1f} 秒，3BV {rec.bbbv}，"
+                        f"点击 {rec.clicks} 次，效率 {rec.bbbv / rec.clicks:.0%}，"
+                        f"{rec.speed:.2f} 3BV/s"
+                    )
+            if coop and (board := self.game_mgr.contributions.get(sid)):
+                ranking = "、".join(f"{n} {c} 步" for n, c in board.most_common())
+                msgs.append(f"本局贡献：{ranking}")
+            self.game_mgr.stop(sid)
+
+        delivery = None
+        if img is not None:
+            delivery = self.sender.submit_img(event, img, quality)
+        elif wanted and quality == Quality.TEXT:
+            delivery = self.sender.submit_text(event, game.draw_text())
+        elif wanted or game.is_over:
+            self.sender.skip_frame(event)
+        return msgs, game.is_fail, delivery
+
+    async def _resend_board(
+        self,
+        event: AstrMessageEvent,
+        game: MineSweeper | RemoteGame | EndlessGame,
+        quality: Quality,
+    ):
+        """补发棋盘，失败只记日志（原异常由调用方继续抛出）"""
+        if quality == Quality.SKIP:
+            self.sender.skip_frame(event)
+            return
+        quality = min(quality, Quality.PALETTE)
+        try:
+            img = await self.game_mgr.render(game, quality)
+        except Exception as e:
+            logger.warning(f"[扫雷] 补发棋盘失败：{e}")
+            return
+        self.sender.submit_img(event, img, quality)
 
-        img_path = self._save_img_bytes(event, game.draw())
-        await self.sender.send_img_replace_last(event, img_path)
+    async def _send_board_job(
+        self, event: AstrMessageEvent, game: MineSweeper | RemoteGame
+    ):
+        """GUI 请求发送当前棋盘"""
+        quality = min(self.sender.quality(event), Quality.PALETTE)
+        img = await self.game_mgr.render(game, quality)
+        self.sender.submit_img(event, img, quality)
@@ -1,28 +1,131 @@
+import asyncio
+import base64
+import itertools
+import os
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent
 from astrbot.core.config.astrbot_config import AstrBotConfig
-from astrbot.core.message.components import Image
+from astrbot.core.message.components import Image, Plain
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
     AiocqhttpMessageEvent,
 )
 
+from .core.expiry import ExpiryHeap
+from .core.model import Quality
+from .core.ratelimit import SendBudget
+
+# 每个机器人最多积压的待补撤回，超出时丢弃最旧的
+MAX_DEFERRED_RECALLS = 64
+
+
+class ImageFileCache:
+    """
+    图片落盘缓存（兜底发送方式）：
+    - 每次写入独立文件名，避免并发覆盖
+    - 先写临时文件再原子替换
+    - 超出数量上限时淘汰最旧的文件
+    """
+
+    def __init__(self, cache_dir: Path, max_files: int = 64):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._files: deque[Path] = deque()
+        self._seq = itertools.count()
+
+    async def save(self, key: str, data: bytes) -> str:
+        """写入图片，返回绝对路径"""
+        name = re.sub(r"[^\w-]", "_", key)
+        path = self.cache_dir / f"{name}_{next(self._seq)}.png"
+        await asyncio.to_thread(self._write_atomic, path, data)
+
+        self._files.append(path)
+        expired = []
+        while len(self._files) > self.max_files:
+            expired.append(self._files.popleft())
+        if expired:
+            await asyncio.to_thread(self._remove, expired)
+
+        return str(path.absolute())
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(paths: list[Path]):
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+
+@dataclass
+class _Frame:
+    """待发送的一帧棋盘（图片或文字）"""
+
+    event: AstrMessageEvent
+    key: str
+    future: asyncio.Future[bool]
+    image: bytes | None = None
+    text: str = ""
+
+
+@dataclass
+class _Outbox:
+    """单个 session 的发送队列（同 key 只保留最新一帧）"""
+
+    pending: OrderedDict[str, _Frame] = field(default_factory=OrderedDict)
+    worker: asyncio.Task | None = None
+
 
 class MessageSender:
     """
     会话 + 用户级“覆盖发送”工具：
-    - 同一 session + 同一用户 只保留最后一条消息
-    - 新消息发送前自动撤回上一条
+    - 同一 session + 同一用户 只保留最后一条消息（合作模式下同一 session 只保留一条）
+    - 新消息发出后撤回上一条，撤回与下一次发送并行
+    - 同一 session 的发送严格串行，排队中被新帧覆盖的旧帧直接丢弃
+    - 图片默认以内存数据直接发送，可配置为落盘后按路径发送
+    - 每个机器人账号一份发送预算（发送 / 撤回共用），由调用方按 quality 降级出图
+    - 令牌不足时撤回不丢弃，进入待补队列，令牌回升后按序补撤回
     """
 
-    def __init__(self, config: AstrBotConfig):
+    def __init__(
+        self, config: AstrBotConfig, cache_dir: Path, id_ttl: float = 1800
+    ):
         self.config = config
         # key(session_id:uid) -> last message_id
         self._last_message_id: dict[str, int] = {}
+        self._id_expiry = ExpiryHeap(id_ttl)
+        self._file_cache = ImageFileCache(cache_dir)
 
-    @staticmethod
-    def _make_key(event: AiocqhttpMessageEvent) -> str:
+        # session_id -> 发送队列
+        self._outboxes: dict[str, _Outbox] = {}
+        self._recall_tasks: set[asyncio.Task] = set()
+
+        # 实际送达顺序：(序号, key, message_id)
+        self.delivery_log: deque[tuple[int, str, int | None]] = deque(maxlen=256)
+        self._delivery_seq = itertools.count(1)
+
+        # 机器人账号 -> 发送预算
+        self._budgets: dict[str, SendBudget] = {}
+        self._budget_rate = float(config.get("send_rate", 0)) / 60
+        self._budget_burst = float(config.get("send_burst", 20))
+        # 机器人账号 -> 令牌不足时推迟的撤回 (event, message_id)，令牌回升后按序补上
+        self._deferred: dict[str, deque[tuple[AstrMessageEvent, int]]] = {}
+        self._retry_tasks: dict[str, asyncio.Task] = {}
+
+    def _make_key(self, event: AstrMessageEvent) -> str:
         """
-        session + sender 作为唯一键
+        session + sender 作为唯一键；合作模式下整个 session 共用一个
         """
+        if self.config.get("coop_mode", False):
+            return event.session_id
         return f"{event.session_id}:{event.get_sender_id()}"
 
     @staticmethod
@@ -39,41 +142,242 @@ class MessageSender:
 
         return result.get("message_id")
 
-    async def _recall_last_message(self, event: AiocqhttpMessageEvent):
+    @staticmethod
+    async def _recall_message(event: AiocqhttpMessageEvent, message_id: int):
         """
-        撤回当前 session + 用户 上一次发送的消息（若存在）
+        撤回指定消息
         """
-        key = self._make_key(event)
-        last_message_id = self._last_message_id.get(key)
+        await event.bot.delete_msg(message_id=message_id)
 
-        if not last_message_id:
+    async def _recall(
+        self, event: AiocqhttpMessageEvent, budget: SendBudget, message_id: int
+    ):
+        """按预算撤回；令牌不足或前面还有待补的撤回时推迟"""
+        if self._deferred.get(event.get_self_id()) or not budget.try_spend():
+            self._defer_recall(event, budget, message_id)
             return
+        await self._recall_now(event, budget, message_id)
 
+    async def _recall_now(
+        self, event: AiocqhttpMessageEvent, budget: SendBudget, message_id: int
+    ):
+        """撤回（令牌已扣），失败计数（已被撤回 / 超时 / 权限不足 / 被限流）"""
         try:
-            await event.bot.delete_msg(message_id=last_message_id)
-        except Exception:
-            # 已被撤回 / 超时 / 权限不足等情况，直接忽略
-            pass
-        finally:
-            self._last_message_id.pop(key, None)
+            await self._recall_message(event, message_id)
+        except Exception as e:
+            budget.fail("recall")
+            logger.warning(f"[扫雷] 撤回消息 {message_id} 失败：{e}")
+
+    def _defer_recall(
+        self, event: AiocqhttpMessageEvent, budget: SendBudget, message_id: int
+    ):
+        bot_id = event.get_self_id()
+        pending = self._deferred.get(bot_id)
+        if pending is None:
+            pending = self._deferred[bot_id] = deque(maxlen=MAX_DEFERRED_RECALLS)
+        if len(pending) == pending.maxlen:
+            budget.counters["recall_dropped"] += 1
+        pending.append((event, message_id))
+        budget.counters["recall_deferred"] += 1
+
+        task = self._retry_tasks.get(bot_id)
+        if task is None or task.done():
+            self._retry_tasks[bot_id] = asyncio.create_task(
+                self._retry_recalls(bot_id, budget, pending)
+            )
+
+    async def _retry_recalls(
+        self,
+        bot_id: str,
+        budget: SendBudget,
+        pending: deque[tuple[AstrMessageEvent, int]],
+    ):
+        """令牌回升后按推迟顺序补撤回"""
+        while pending:
+            if not budget.try_spend():
+                await asyncio.sleep(budget.wait_time())
+                continue
+            event, message_id = pending.popleft()
+            await self._recall_now(event, budget, message_id)
+        if self._deferred.get(bot_id) is pending:
+            del self._deferred[bot_id]
 
-    async def send_img_replace_last(self, event: AstrMessageEvent, image_path: str):
+    # ========= 发送预算 =========
+
+    def budget(self, event: AstrMessageEvent) -> SendBudget:
+        bot_id = event.get_self_id()
+        budget = self._budgets.get(bot_id)
+        if budget is None:
+            budget = self._budgets[bot_id] = SendBudget(
+                f"机器人 {bot_id}", self._budget_rate, self._budget_burst
+            )
+        return budget
+
+    def quality(self, event: AstrMessageEvent) -> Quality:
+        """当前应使用的输出画质（待补的撤回优先占用令牌）"""
+        deferred = self._deferred.get(event.get_self_id(), ())
+        return self.budget(event).quality(reserved=len(deferred))
+
+    def charge(self, event: AstrMessageEvent, quality: Quality | None = None):
         """
-        发送图片，并替换（撤回）同 session + 同用户 上一次发送的消息
+        登记一条不经发送队列、由平台直接发出的消息
+        quality 为 None 表示文字回复，否则为开局图 / 雷盘等棋盘图
         """
+        budget = self.budget(event)
+        budget.spend()
+        if quality is None:
+            budget.counters["reply"] += 1
+        else:
+            budget.record(quality)
+
+    def skip_frame(self, event: AstrMessageEvent):
+        """登记一帧因预算不足而跳过的棋盘"""
+        self.budget(event).record(Quality.SKIP)
+
+    def budget_stats(self) -> dict[str, dict]:
+        """各机器人的当前画质、剩余令牌与各级计数"""
+        return {
+            b.name: {
+                "level": b.level.label,
+                "tokens": b.tokens,
+                "recall_pending": len(self._deferred.get(bot_id, ())),
+                **b.counters,
+            }
+            for bot_id, b in self._budgets.items()
+        }
+
+    # ========= 发送队列 =========
+
+    def submit_img(
+        self,
+        event: AstrMessageEvent,
+        image: bytes,
+        quality: Quality = Quality.FULL,
+    ) -> asyncio.Future[bool]:
+        """
+        图片入队，返回送达结果（被新帧覆盖时为 False）
+        """
+        self.budget(event).record(quality)
+        return self._enqueue(event, image=image)
+
+    def submit_text(self, event: AstrMessageEvent, text: str) -> asyncio.Future[bool]:
+        """
+        文字棋盘入队，与图片共用同一覆盖 / 撤回队列
+        """
+        self.budget(event).record(Quality.TEXT)
+        return self._enqueue(event, text=text)
+
+    def _enqueue(
+        self, event: AstrMessageEvent, image: bytes | None = None, text: str = ""
+    ) -> asyncio.Future[bool]:
+        key = self._make_key(event)
+        outbox = self._outboxes.setdefault(event.session_id, _Outbox())
+
+        superseded = outbox.pending.pop(key, None)
+        if superseded and not superseded.future.done():
+            superseded.future.set_result(False)
+
+        future = asyncio.get_running_loop().create_future()
+        outbox.pending[key] = _Frame(event, key, future, image, text)
+
+        if outbox.worker is None or outbox.worker.done():
+            outbox.worker = asyncio.create_task(self._drain(event.session_id, outbox))
+        return future
+
+    async def _drain(self, session_id: str, outbox: _Outbox):
+        """按入队顺序逐帧发送"""
+        while outbox.pending:
+            _, frame = outbox.pending.popitem(last=False)
+            try:
+                await self._deliver(frame)
+            except Exception as e:
+                if not frame.future.done():
+                    frame.future.set_exception(e)
+            else:
+                if not frame.future.done():
+                    frame.future.set_result(True)
+
+        if self._outboxes.get(session_id) is outbox:
+            del self._outboxes[session_id]
+
+    async def _deliver(self, frame: _Frame):
+        event = frame.event
+        budget = self.budget(event)
+
+        image_path = None
+        if frame.image is not None and self.config.get("image_by_file", False):
+            image_path = await self._file_cache.save(frame.key, frame.image)
+
         # 非 aiocqhttp 平台：直接发，不做撤回
         if not isinstance(event, AiocqhttpMessageEvent):
-            await event.send(event.chain_result([Image.fromFileSystem(image_path)]))
+            if frame.image is None:
+                comp = Plain(frame.text)
+            elif image_path:
+                comp = Image.fromFileSystem(image_path)
+            else:
+                comp = Image.fromBytes(frame.image)
+            budget.spend()
+            try:
+                await event.send(event.chain_result([comp]))
+            except Exception:
+                budget.fail("send")
+                raise
+            self.delivery_log.append((next(self._delivery_seq), frame.key, None))
             return
 
         # 1. 发送新消息
-        payloads = {"message": [{"type": "image", "data": {"file": image_path}}]}
-        message_id = await self._send_msg(event, payloads)
-
-        # 2. 撤回上一条
-        await self._recall_last_message(event)
+        if frame.image is None:
+            segment = {"type": "text", "data": {"text": frame.text}}
+        else:
+            file = image_path or f"base64://{base64.b64encode(frame.image).decode()}"
+            segment = {"type": "image", "data": {"file": file}}
+        budget.spend()
+        try:
+            message_id = await self._send_msg(event, {"message": [segment]})
+        except Exception:
+            budget.fail("send")
+            raise
+        self.delivery_log.append((next(self._delivery_seq), frame.key, message_id))
 
-        # 3. 记录 message_id
+        # 2. 记录 message_id
+        last_message_id = self._last_message_id.pop(frame.key, None)
         if message_id:
-            key = self._make_key(event)
-            self._last_message_id[key] = message_id
+            self._last_message_id[frame.key] = message_id
+            self._id_expiry.touch(frame.key)
+        else:
+            self._id_expiry.discard(frame.key)
+
+        # 3. 撤回上一条（与下一帧发送并行）
+        if last_message_id:
+            task = asyncio.create_task(self._recall(event, budget, last_message_id))
+            self._recall_tasks.add(task)
+            task.add_done_callback(self._recall_tasks.discard)
+
+    async def send_img_replace_last(
+        self, event: AstrMessageEvent, image: bytes
+    ) -> bool:
+        """
+        发送图片，并替换（撤回）同 session + 同用户 上一次发送的消息
+        """
+        return await self.submit_img(event, image)
+
+    def evict_expired(self, now: float | None = None) -> int:
+        """
+        清理过期的 message_id 记录，返回清理数量
+        """
+        expired = self._id_expiry.pop_expired(now)
+        for key in expired:
+            self._last_message_id.pop(key, None)
+        return len(expired)
+
+    def next_deadline(self) -> float | None:
+        return self._id_expiry.next_deadline()
+
+    async def close(self):
+        """等待队列中的发送与撤回完成，放弃仍在等令牌的撤回"""
+        workers = [o.worker for o in self._outboxes.values() if o.worker]
+        await asyncio.gather(*workers, *self._recall_tasks, return_exceptions=True)
+        for task in self._retry_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._retry_tasks.values(), return_exceptions=True)
+        self._retry_tasks.clear()